@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Equivalence and throughput benchmark for the Python and C(++) CANSource plugins.
+
+For every requested capture size, a synthetic capture is generated against the
+CAN database (known, multiplexed and unknown frame IDs, in a configurable mix).
+Both implementations are then run over it:
+
+ * once with `sink.text.details`, and the outputs are compared (this is what
+   `check.sh` does for `test.data`); only the Python plugin supports packets,
+   so packet messages and the packet properties of the stream class are left
+   out of the comparison,
+ * `--repeat` times over an empty capture, to measure initialization time
+   (process startup, plugin and database loading, trace class creation),
+ * `--repeat` times with `sink.utils.dummy`, to measure events/s, MB/s and
+   peak RSS.
+
+The best run of each is kept. Throughput is the decoding throughput: the
+initialization time is subtracted from the run time before dividing.
+
+Results can be saved as JSON with `--save` and later compared against with
+`--baseline`; the script then exits with a non-zero status if the decoding
+throughput (events/s) of any implementation/mode dropped by more than
+`--max-regression`.
+
+Additional performance modes are given with `--mode NAME=PARAMS`, where PARAMS
+is appended to the CANSource `--params` string, e.g.:
+
+    ./bench.py --mode 'default=' --mode 'other=some-param=true'
+"""
+
+import argparse
+import collections
+import difflib
+import functools
+import itertools
+import json
+import os
+import random
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+
+IMPLEMENTATIONS = ("python", "c")
+
+# Frame ID that is guaranteed not to be in the database.
+UNKNOWN_FRAME_ID = 0x7FF
+
+# `sink.text.details` lines which differ between the implementations
+# (stream class packet properties).
+PACKET_PROPERTY_RE = re.compile(r"\s*(Supports packets|Packets have)")
+
+# Messages shown before and after the first difference of the outputs.
+DIFF_CONTEXT = 3
+
+# Lower bound of the decoding time, in s, should the initialization time
+# exceed the run time (tiny captures, noise).
+MIN_DECODING_TIME = 1e-6
+
+
+def parse_database(path):
+    """
+    Extracts (frame_id, length, multiplexer) for every message of a dbc file.
+
+    Only what is needed to generate decodable frames is parsed:
+    `multiplexer` is None for plain messages, otherwise a tuple
+    (start_bit, bit_length, [mux values]).
+    """
+    messages = []
+    message = None
+
+    with open(path, "r", encoding="latin-1") as f:
+        for line in f:
+            line = line.strip()
+
+            match = re.match(r"BO_ (\d+) \w+ ?: (\d+)", line)
+            if match:
+                message = [int(match.group(1)), int(match.group(2)), None]
+                messages.append(message)
+                continue
+
+            if message is None or not line.startswith("SG_"):
+                continue
+
+            match = re.match(r"SG_ \w+ +(M|m(\d+))? *: (\d+)\|(\d+)@", line)
+            if not match or match.group(1) is None:
+                continue
+
+            if match.group(1) == "M":
+                message[2] = (int(match.group(3)), int(match.group(4)), [])
+            elif message[2] is not None:
+                values = message[2][2]
+                if int(match.group(2)) not in values:
+                    values.append(int(match.group(2)))
+
+    return [tuple(message) for message in messages]
+
+
+def generate_capture(path, messages, count, mix, seed):
+    """
+    Writes `count` frames into `path`, using the `<ii8s` frame format.
+
+    `mix` is a (plain, multiplexed, unknown) tuple of relative weights.
+    """
+    rng = random.Random(seed)
+
+    plain = [m for m in messages if m[2] is None]
+    multiplexed = [m for m in messages if m[2] is not None and m[2][2]]
+    pools = [plain, multiplexed, [(UNKNOWN_FRAME_ID, 8, None)]]
+    weights = [w if pool else 0 for (w, pool) in zip(mix, pools)]
+
+    with open(path, "wb") as f:
+        for ts in range(count):
+            pool = rng.choices(pools, weights)[0]
+            (frame_id, _, multiplexer) = rng.choice(pool)
+
+            data = rng.getrandbits(64)
+            if multiplexer is not None:
+                (start, length, values) = multiplexer
+                mask = ((1 << length) - 1) << start
+                data = (data & ~mask) | (rng.choice(values) << start)
+
+            f.write(struct.pack("<ii8s", ts, frame_id, data.to_bytes(8, "little")))
+
+
+def source_params(inputs, database, extra):
+    """
+    Returns the CANSource `--params` string; `extra` is appended as is.
+    """
+    params = "inputs=" + json.dumps(inputs) + ",databases=" + json.dumps([database])
+    if extra:
+        params += "," + extra
+    return params
+
+
+def run_babeltrace(babeltrace, plugin_path, params, sink, stdout):
+    """
+    Runs a CANSource -> sink graph, returns (wall time in s, peak RSS in kB).
+    """
+    cmd = [
+        babeltrace,
+        "--plugin-path", plugin_path,
+        "-c", "source.can.CANSource", "--params", params,
+        "-c", sink,
+    ]
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=stdout)
+    (_, status, rusage) = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"`{' '.join(cmd)}` failed with status {proc.returncode}")
+
+    return (elapsed, rusage.ru_maxrss)
+
+
+def read_messages(f):
+    """
+    Yields the messages of a `sink.text.details` output, as lists of lines.
+
+    Messages are separated by empty lines; packet messages and stream class
+    packet properties are skipped, as only the Python plugin has them.
+    """
+    message = []
+    for line in itertools.chain(f, [""]):
+        if line.strip():
+            if not PACKET_PROPERTY_RE.match(line):
+                message.append(line)
+            continue
+
+        if message and not any(l.startswith(("Packet beginning", "Packet end")) for l in message):
+            yield message
+        message = []
+
+
+def check_equivalence(args, params):
+    """
+    Compares the `sink.text.details` output of all implementations.
+    Returns True if they are identical.
+
+    Outputs are compared message by message, and only an excerpt around the
+    first difference is printed.
+    """
+    outputs = {}
+    try:
+        for impl in IMPLEMENTATIONS:
+            outputs[impl] = tempfile.TemporaryFile("w+")
+            run_babeltrace(args.babeltrace, args.plugin_path[impl], params, "sink.text.details", outputs[impl])
+            outputs[impl].seek(0)
+
+        (reference_impl, *other_impls) = IMPLEMENTATIONS
+        identical = True
+        for impl in other_impls:
+            outputs[reference_impl].seek(0)
+            if not compare_messages(reference_impl, outputs[reference_impl], impl, outputs[impl]):
+                identical = False
+    finally:
+        for f in outputs.values():
+            f.close()
+
+    return identical
+
+
+def compare_messages(name_a, f_a, name_b, f_b):
+    """
+    Returns True if both outputs have the same messages, otherwise prints the
+    first differing message, with DIFF_CONTEXT messages around it.
+    """
+    messages_a = read_messages(f_a)
+    messages_b = read_messages(f_b)
+    before = collections.deque(maxlen=DIFF_CONTEXT)
+
+    for (index, (a, b)) in enumerate(itertools.zip_longest(messages_a, messages_b)):
+        if a == b:
+            before.append(a)
+            continue
+
+        excerpt_a = list(before) + [a or []] + list(itertools.islice(messages_a, DIFF_CONTEXT))
+        excerpt_b = list(before) + [b or []] + list(itertools.islice(messages_b, DIFF_CONTEXT))
+        print(f"Message {index} differs between {name_a} and {name_b}:")
+        sys.stdout.writelines(difflib.unified_diff(
+            [line for message in excerpt_a for line in message + ["\n"]],
+            [line for message in excerpt_b for line in message + ["\n"]],
+            name_a, name_b
+        ))
+        return False
+
+    return True
+
+
+def measure(args, impl, params, data_path, empty_path):
+    """
+    Returns the throughput / memory / init time figures of one implementation.
+
+    `params` returns the CANSource parameters for a list of inputs. The
+    throughput is computed from the run time minus the init time, so it
+    doesn't depend on startup costs.
+    """
+    init = min(
+        run_babeltrace(
+            args.babeltrace, args.plugin_path[impl],
+            params([empty_path]), "sink.utils.dummy", subprocess.DEVNULL
+        )[0]
+        for _ in range(args.repeat)
+    )
+
+    runs = [
+        run_babeltrace(
+            args.babeltrace, args.plugin_path[impl],
+            params([data_path]), "sink.utils.dummy", subprocess.DEVNULL
+        )
+        for _ in range(args.repeat)
+    ]
+    elapsed = min(run[0] for run in runs)
+    rss = max(run[1] for run in runs)
+    decoding = max(elapsed - init, MIN_DECODING_TIME)
+
+    size = os.path.getsize(data_path)
+    return {
+        "events/s": (size // 16) / decoding,
+        "MB/s": size / decoding / 1e6,
+        "peak RSS (kB)": rss,
+        "init (s)": init,
+        "wall (s)": elapsed,
+    }
+
+
+def check_regressions(results, baseline, max_regression):
+    """
+    Returns the list of (key, baseline events/s, current events/s) which regressed.
+    """
+    regressions = []
+    for (key, result) in results.items():
+        if key not in baseline:
+            continue
+
+        before = baseline[key]["events/s"]
+        after = result["events/s"]
+        if after < before * (1 - max_regression):
+            regressions.append((key, before, after))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--babeltrace", default=os.environ.get("BABELTRACE2", "babeltrace2"))
+    parser.add_argument("--database", default=os.path.join(os.path.dirname(__file__), "database.dbc"))
+    parser.add_argument(
+        "--count", type=int, action="append",
+        help="Number of frames of a generated capture, may be repeated (default: 100000)"
+    )
+    parser.add_argument(
+        "--mix", type=float, nargs=3, default=(0.7, 0.2, 0.1), metavar=("PLAIN", "MUX", "UNKNOWN"),
+        help="Relative weights of plain, multiplexed and unknown frame IDs"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Throughput runs per measure, best is kept")
+    parser.add_argument(
+        "--mode", action="append",
+        help="Performance mode as NAME=PARAMS, PARAMS being appended to the CANSource parameters"
+    )
+    parser.add_argument("--no-check", action="store_true", help="Skip the output equivalence check")
+    parser.add_argument("--save", help="Save results to this JSON file")
+    parser.add_argument("--baseline", help="Compare results against this JSON file")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.1,
+        help="Tolerated events/s drop against the baseline, as a fraction (default: 0.1)"
+    )
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    args.plugin_path = {"python": os.path.join(here, "python"), "c": os.path.join(here, "c")}
+
+    modes = dict(mode.split("=", 1) for mode in (args.mode or ["default="]))
+    messages = parse_database(args.database)
+
+    results = {}
+    equivalent = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        empty_path = os.path.join(tmp, "empty.data")
+        open(empty_path, "wb").close()
+
+        for count in args.count or [100000]:
+            data_path = os.path.join(tmp, f"{count}.data")
+            generate_capture(data_path, messages, count, args.mix, args.seed)
+
+            for (mode, extra) in modes.items():
+                params = functools.partial(source_params, database=os.path.abspath(args.database), extra=extra)
+
+                if not args.no_check:
+                    print(f"Checking equivalence: {count} frames, mode `{mode}`.")
+                    if not check_equivalence(args, params([data_path])):
+                        equivalent = False
+
+                for impl in IMPLEMENTATIONS:
+                    key = f"{impl}/{mode}/{count}"
+                    results[key] = measure(args, impl, params, data_path, empty_path)
+
+    print(
+        f"{'implementation/mode/frames':40} {'events/s':>12} {'MB/s':>8} {'peak RSS (kB)':>14} "
+        f"{'init (s)':>9} {'wall (s)':>9}"
+    )
+    for (key, result) in results.items():
+        print(
+            f"{key:40} {result['events/s']:12.0f} {result['MB/s']:8.2f} "
+            f"{result['peak RSS (kB)']:14} {result['init (s)']:9.3f} {result['wall (s)']:9.3f}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if not equivalent:
+        print("Outputs of the implementations differ.")
+        status = 1
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        for (key, before, after) in check_regressions(results, baseline, args.max_regression):
+            print(f"Regression: {key}: {before:.0f} -> {after:.0f} events/s")
+            status = 1
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
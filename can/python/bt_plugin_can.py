@@ -46,6 +46,8 @@ class CANIterator(bt2._UserMessageIterator):
             #
             self._create_stream_end_message(self._stream)
         ]
+        # Packet end timestamp of an empty capture, same as the packet beginning
+        self._last_timestamp = 0
 
         self._next = self._next_init
 
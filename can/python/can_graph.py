@@ -14,9 +14,32 @@ LIBBABELTRACE2_PLUGIN_PROVIDER_DIR = [babeltrace2 build folder]/src/python-plugi
 
 import bt2
 import collections.abc
+import concurrent.futures
+import glob
+import multiprocessing
+import os
+import sys
+import time
+import traceback
 
 # import local modules
 from graph.utils import load_plugins, cmd_parser
+from graph.instrument import connect_instrumented
+
+
+def connect_ports(graph, upstream_port, downstream_port):
+    """
+    Connects two ports of the graph, through an instrumentation filter if --instrument was given.
+    """
+    global instrument, instrument_interval, instrument_output
+
+    if instrument:
+        params = {'interval': instrument_interval}
+        if instrument_output:
+            params['output'] = instrument_output
+        connect_instrumented(graph, upstream_port, downstream_port, params)
+    else:
+        graph.connect_ports(upstream_port, downstream_port)
 
 
 def graph_can_detail():
@@ -48,7 +71,8 @@ def graph_can_detail():
     # the input file path for port name.
     #
     # So we will ignore the port name and connect the first available port from the component.
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_source.output_ports.values())[0],
         list(graph_sink.input_ports.values())[0]
     )
@@ -158,7 +182,8 @@ def graph_can_user_detail():
     graph_sink = graph.add_component(MySink, 'test_sink')
 
     # Connect components together
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_source.output_ports.values())[0],
         list(graph_sink.input_ports.values())[0]
     )
@@ -193,7 +218,8 @@ def graph_can_ctf():
     )
 
     # Connect components together
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_source.output_ports.values())[0],
         list(graph_sink.input_ports.values())[0]
     )
@@ -246,11 +272,13 @@ def graph_can_filter_ctf():
     )
 
     # Connect components together
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_source.output_ports.values())[0],
         list(graph_filter.input_ports.values())[0]
     )
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_filter.output_ports.values())[0],
         list(graph_sink.input_ports.values())[0]
     )
@@ -304,11 +332,13 @@ def graph_ctf_filter_ctf():
     )
 
     # Connect components together
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_source.output_ports.values())[0],
         list(graph_filter.input_ports.values())[0]
     )
-    graph.connect_ports(
+    connect_ports(
+        graph,
         list(graph_filter.output_ports.values())[0],
         list(graph_sink.input_ports.values())[0]
     )
@@ -325,13 +355,161 @@ cmd_examples = {
     'ctf_filter_ctf' : graph_ctf_filter_ctf
 }
 
+
+# Size of a frame of a CANSource capture
+CAN_FRAME_SIZE = 16
+
+# Examples reading a CANSource capture, which can be run in batch
+batch_examples = ('can_detail', 'can_user_detail', 'can_ctf', 'can_filter_ctf')
+
+
+def expand_captures(patterns):
+    """
+    Returns the captures matching paths or glob patterns, without duplicates.
+    """
+    captures = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"Warning: no capture matches {pattern}")
+
+        for capture in map(os.path.abspath, matches):
+            if capture not in captures:
+                captures.append(capture)
+
+    return captures
+
+
+def batch_output_dirs(captures, output_dir):
+    """
+    Returns one output directory per capture, named after it (and numbered if names clash).
+    """
+    dirs = []
+    for capture in captures:
+        name = os.path.splitext(os.path.basename(capture))[0]
+        path = os.path.join(output_dir, name)
+        index = 1
+        while path in dirs:
+            path = os.path.join(output_dir, f"{name}-{index}")
+            index += 1
+        dirs.append(path)
+
+    return [os.path.abspath(path) for path in dirs]
+
+
+def batch_init(args):
+    """
+    Batch worker process initializer - each worker loads the plugins once, then runs one graph at a time.
+    """
+    global plugins
+
+    globals().update(args)
+    plugins = load_plugins(system_plugin_path, plugin_path, cache=not no_plugin_cache)
+
+
+def batch_run(example, capture, output_dir):
+    """
+    Runs `example` over `capture` in `output_dir`, returns (wall time in s, error or None).
+
+    The examples write to paths relative to the working directory, so it is changed to `output_dir`,
+    and what the graph prints (including text sinks) goes to `output_dir/output.log`.
+    """
+    global CANSource_data_path
+
+    CANSource_data_path = capture
+    os.makedirs(output_dir, exist_ok=True)
+    os.chdir(output_dir)
+
+    sys.stdout.flush()
+    stdout = os.dup(1)
+    start = time.perf_counter()
+    try:
+        with open("output.log", "w") as log:
+            os.dup2(log.fileno(), 1)
+            try:
+                cmd_examples[example]()
+            finally:
+                sys.stdout.flush()
+                os.dup2(stdout, 1)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        os.close(stdout)
+
+    return (time.perf_counter() - start, error)
+
+
+def run_batch(example, captures, output_dir, jobs):
+    """
+    Runs `example` over every capture, in a pool of `jobs` processes, and prints a summary table.
+    Returns the number of failed captures.
+    """
+    output_dirs = batch_output_dirs(captures, output_dir)
+
+    # Paths are made absolute, as workers change their working directory
+    worker_args = {
+        "system_plugin_path": system_plugin_path and os.path.abspath(system_plugin_path),
+        "plugin_path": os.path.abspath(plugin_path),
+        "no_plugin_cache": no_plugin_cache,
+        "instrument": instrument,
+        "instrument_interval": instrument_interval,
+        # Relative to each capture's output directory
+        "instrument_output": instrument_output,
+        "CANSource_dbc_path": os.path.abspath(CANSource_dbc_path),
+    }
+
+    # Spawned rather than forked, so each worker has its own, freshly initialized, bt2 library
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=batch_init,
+        initargs=(worker_args,)
+    ) as executor:
+        futures = [
+            executor.submit(batch_run, example, capture, path)
+            for (capture, path) in zip(captures, output_dirs)
+        ]
+
+        results = []
+        for (capture, future) in zip(captures, futures):
+            try:
+                results.append(future.result())
+            except Exception:
+                # The worker itself failed, e.g. it crashed or plugins couldn't be loaded
+                results.append((0.0, traceback.format_exc()))
+
+    failures = 0
+    print(f"{'capture':50} {'status':>6} {'wall (s)':>9} {'events':>10} {'events/s':>12}")
+    for (capture, path, (elapsed, error)) in zip(captures, output_dirs, results):
+        events = os.path.getsize(capture) // CAN_FRAME_SIZE if os.path.isfile(capture) else 0
+        rate = events / elapsed if elapsed > 0 else 0.0
+        status = "ok" if error is None else "FAILED"
+        print(f"{os.path.relpath(capture):50} {status:>6} {elapsed:9.3f} {events:10} {rate:12.0f}")
+
+        if error is not None:
+            failures += 1
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "error.log"), "w") as f:
+                f.write(error)
+
+    for (capture, path, (_, error)) in zip(captures, output_dirs, results):
+        if error is not None:
+            print(f"\n{os.path.relpath(capture)} failed (see {os.path.relpath(path)}):\n{error}")
+
+    print(f"\n{len(captures) - failures}/{len(captures)} captures done, outputs in {os.path.relpath(output_dir)}")
+    return failures
+
+
 def main():
     global example
 
     cmd_examples[example]()
 
 if __name__ == "__main__":
-    global system_plugin_path, plugin_path
+    global system_plugin_path, plugin_path, list_plugins, no_plugin_cache
+    global batch, jobs, output_dir
+    global instrument, instrument_interval, instrument_output
     global plugins
 
     # Parse command line and add parsed parameters to globals
@@ -344,8 +522,42 @@ if __name__ == "__main__":
         choices=cmd_examples.keys(),
         help="\n".join([f"{example[0]}: {example[1].__doc__}" for example in cmd_examples.items()])
     )
+    parser.add_argument(
+        "--batch", type=str, nargs="+", metavar="CAPTURE",
+        help="Run the example over every capture (paths or glob patterns, quoted) instead of\n"
+             "--CANSource-data-path, in parallel, each in its own directory under --output-dir, e.g.:\n"
+             "  can_graph.py can_ctf --batch 'captures/*.data'\n"
+             f"Only for the examples reading a capture: {', '.join(batch_examples)}"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(),
+        help="Number of processes running batch graphs (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--output-dir", type=str, default="./batch",
+        help="Directory holding the per-capture output directories of a batch"
+    )
+
+    parser.add_argument(
+        "--instrument", action="store_true",
+        help="Insert an instrumentation filter between every two connected components, reporting\n"
+             "message counts, rates and upstream wait times"
+    )
+    parser.add_argument(
+        "--instrument-interval", type=float, default=1.0,
+        help="Seconds between instrumentation reports, 0 for a final report only (default: 1.0)"
+    )
+    parser.add_argument(
+        "--instrument-output", type=str, default=None,
+        help="Append instrumentation reports as JSON lines to this file, rather than printing them to stderr"
+    )
 
     globals().update(vars(parser.parse_args()))
 
-    plugins = load_plugins(system_plugin_path, plugin_path)
+    if batch:
+        if example not in batch_examples:
+            parser.error(f"--batch is not supported by {example}, which doesn't read a capture")
+        sys.exit(1 if run_batch(example, expand_captures(batch), output_dir, jobs) else 0)
+
+    plugins = load_plugins(system_plugin_path, plugin_path, verbose=list_plugins, cache=not no_plugin_cache)
     main()
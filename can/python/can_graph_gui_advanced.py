@@ -13,262 +13,426 @@ LIBBABELTRACE2_PLUGIN_PROVIDER_DIR = [babeltrace2 build folder]/src/python-plugi
 """
 
 import bt2
-from bt2 import field_class
+from bt2 import field, field_class
 
 from PyQt5.Qt import *
 from PyQt5.QtWidgets import *
 
 # import local modules
-from graph.model import AppendableTableModel
+from graph.model import AppendableTableModel, DiskEventStorage
+from graph.runner import BatchEmitter, GraphRunner
 from graph.utils import load_plugins, cmd_parser
 
 
+def snapshot_field(payload):
+    """
+    Returns a plain Python copy of a payload field, which remains valid once the message is released and can be
+    handed over to another thread. It provides what the tree model update handlers use: str(), and int(), float()
+    or values() depending on the field type.
+    """
+    if isinstance(payload, field._StructureFieldConst):
+        return StructureSnapshot({name: snapshot_field(member) for (name, member) in payload.items()}, str(payload))
+    if isinstance(payload, field._EnumerationFieldConst):
+        return EnumerationSnapshot(int(payload), str(payload))
+    if isinstance(payload, field._IntegerFieldConst):
+        return int(payload)
+    if isinstance(payload, field._RealFieldConst):
+        return float(payload)
+    if isinstance(payload, field._BoolFieldConst):
+        return bool(payload)
+    return str(payload)
+
+
+class EnumerationSnapshot(int):
+    """
+    Snapshot of an enumeration field: its integer value, printed like the field (with its labels).
+    """
+
+    def __new__(cls, value, text):
+        snapshot = super().__new__(cls, value)
+        snapshot._text = text
+        return snapshot
+
+    def __str__(self):
+        return self._text
+
+
+class StructureSnapshot(dict):
+    """
+    Snapshot of a structure field: a dict of its member snapshots, printed like the field.
+    """
+
+    def __init__(self, members, text):
+        super().__init__(members)
+        self._text = text
+
+    def __str__(self):
+        return self._text
+
+
+def payload_columns(payload_field_class):
+    """
+    Returns (layout, kinds, extract) for the columnar storage of payloads of `payload_field_class`:
+    layout and kinds describe the payload (see graph.model.EventClassColumns), and extract(payload, values) appends
+    the column values of a payload field to the `values` list.
+    """
+    kinds = []
+
+    def parse(child_class):
+        if type(child_class) == field_class._StructureFieldClassConst:
+            members = [(member.name, parse(member.field_class)) for member in child_class.values()]
+
+            def extract_struct(payload, values):
+                for (name, (_, extract)) in members:
+                    extract(payload[name], values)
+
+            return ([(name, layout) for (name, (layout, _)) in members], extract_struct)
+
+        # Enumerations are integers too, but are displayed with their labels
+        if isinstance(child_class, field_class._EnumerationFieldClassConst):
+            (kind, convert) = ('r', repr)
+        elif isinstance(child_class, field_class._UnsignedIntegerFieldClassConst):
+            (kind, convert) = ('Q', int)
+        elif isinstance(child_class, field_class._SignedIntegerFieldClassConst):
+            (kind, convert) = ('q', int)
+        elif isinstance(child_class, field_class._RealFieldClassConst):
+            (kind, convert) = ('d', float)
+        elif type(child_class) == field_class._BoolFieldClassConst:
+            (kind, convert) = ('?', bool)
+        elif type(child_class) == field_class._StringFieldClassConst:
+            (kind, convert) = ('s', str)
+        else:
+            (kind, convert) = ('r', repr)
+
+        kinds.append(kind)
+
+        def extract_leaf(payload, values):
+            values.append(convert(payload))
+
+        return (len(kinds) - 1, extract_leaf)
+
+    if payload_field_class is None:
+        return ([], [], lambda payload, values: None)
+
+    (layout, extract) = parse(payload_field_class)
+    return (layout, kinds, extract)
+
+
+class EventBatch:
+    """
+    What the sink received since the previous batch, in the graph thread.
+    """
+
+    def __init__(self):
+        self.stream_classes = []  # stream classes of new streams
+        self.event_classes = []   # (key, name, layout, kinds) of their event classes, for the table model
+        self.rows = []            # table model rows: (timestamp, event class key, payload column values)
+        self.counts = {}          # event class id -> number of events
+        self.payloads = {}        # event class id -> payload of the last event
+
+    def __len__(self):
+        return len(self.stream_classes) + len(self.rows)
+
+    def prepare(self):
+        # Only the last payload of each event class is displayed, so only those are copied
+        self.payloads = {event_id: snapshot_field(payload) for (event_id, payload) in self.payloads.items()}
+
+
 @bt2.plugin_component_class
 class EventBufferSink(bt2._UserSinkComponent):
     """
-    Sink component that stores event messages in provided EventBuffer.
+    Sink component that collects event messages into batches, handed over to the GUI thread by the provided
+    BatchEmitter.
     """
 
     def __init__(self, config, params, obj):
         self._port = self._add_input_port("in")
-        (self._tableModel, self._treeModel) = obj
+        self._emitter = obj
 
-        # event id -> model update handler
-        self._update = {}
+        # event id -> payload column values extractor
+        self._extract = {}
 
     def _user_graph_is_configured(self):
         self._it = self._create_message_iterator(self._port)
 
     def _user_consume(self):
-        msg = next(self._it)
+        # We are running in the graph thread, so we must not access gui objects
+        self._emitter.poll()
 
-        if type(msg) == bt2._StreamBeginningMessageConst:
+        try:
+            msg = next(self._it)
+        except StopIteration:
+            self._emitter.flush()
+            raise
 
-            # Event class payload field parsing
-            #
-            # More info:
-            #
-            # Common Trace Format (CTF) documentation
-            #   https://diamon.org/ctf/
-            #
-            # C documentation for Stream / Event / Field classes
-            #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-stream-cls.html
-            #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-ev-cls.html
-            #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-ev-cls.html#api-tir-ev-cls-prop-p-fc
-            #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-fc.html
-            #
-            # Python bindings
-            #   babeltrace-2.0.0/src/bindings/python/bt2/bt2/stream_class.py
-            #   babeltrace-2.0.0/src/bindings/python/bt2/bt2/field_class.py
-            #   babeltrace-2.0.0/src/bindings/python/bt2/bt2/field.py
-            #   babeltrace-2.0.0/tests/bindings/python/bt2/test_field.py
-            #
-            # text.details sink source
-            #   babeltrace-2.0.0/src/plugins/text/details/write.c
-            #       static void write_stream_class(struct details_write_ctx *ctx, const bt_stream_class *sc) definition
-            #       static void write_event_class(struct details_write_ctx *ctx, const bt_event_class *ec) definition
-            #       static void write_field_class(struct details_write_ctx *ctx, const bt_field_class *fc) definition
-            #
-            #
-            #   if type(msg) == bt2._StreamBeginningMessageConst:
-            #       list(msg.stream.cls.values())[0] ------------------------->  _EventClassConst
-            #                                                                     defined @ event_class.py
-            #       list(msg.stream.cls.values())[0].payload_field_class ----->  _[X]FieldClassConst
-            #                                                                     defined @ field_class.py:
-            #                                                                    _FIELD_CLASS_TYPE_TO_CONST_OBJ
-            #   if type(msg) == bt2._EventMessageConst:
-            #       list(msg.event.payload_field.values())[0] ---------------->  _[X]FieldConst
-            #                                                                     defined @ field.py:
-            #                                                                    _FIELD_CLASS_TYPE_TO_OBJ
-            # How the tree model + view update handlers are built:
-            #
-            # for event_class in msg.stream.cls.values()
-            #  |- calls parse_field_class(for toplevel field class, tree root node)
-            #      |
-            #      -> parse_field_class(current field class, parent tree node)
-            #      '   |- creates the class_item tree node for current field class & appends it to parent tree node
-            #      '   |- depending on the type of field class
-            #      '   '   |- starts traversal of any sub-field classes by
-            #      '   '   '  calling parse_field_class(sub-field class, class_item)
-            #      '   '   '   |
-            #      '   '   '   -> parse_field_class(...)
-            #      '   '   '         - [recursive operation]
-            #      '   '   |<------- - returns (tree node for sub-field class, payload handler for sub-field class)
-            #      '   '   |
-            #      '   '   | (the sub-field payload handlers are stored)
-            #      '   '   |
-            #      '   '   |- creates payload handler for current field class, which will later, at the time of call,
-            #      '   '   '  be provided with the payload field which corresponds to the field class at the time of
-            #      '   '   '  handler creation in parse_field_class(...)
-            #      '   '   '  The payload handler
-            #      '   '   '   |- updates the tree node of the current field class
-            #      '   '   '   |  (+ notifies the view, done internally by QStandardItem)
-            #      '   '   '   |- unpacks the current payload field into sub-fields and
-            #      '   '   '   |- calls corresponding sub-field handlers for the unpacked sub-fields
-            #      '   '   '
-            #  |<----------|- returns the (class_item tree node, payload handler)
-            #  |
-            #  |- on event_class level only, augments the retrieved payload handler by defining a new handler,
-            #  |  which
-            #  |   |- handles event counting functionality (increments counter + updates the Count column)
-            #  |   |- calls the retrieved payload handler
-            #  |
-            #  |- stores the new payload handler in an [event.id]-indexed dict, which will be later used to call the
-            #     appropriate payload handler for a retrieved message in the _EventMessageConst stage
-            #
-            #
-            # The following code requires a solid understanding of python closures and since people usually stop at
-            # "closures in python are late binding", I want to elaborate on this:
-            #
-            #   When you define a function / lambda *in* a function, and the defined, *inner* function uses a variable
-            #   from the *outer* function scope,
-            #   that variable is a 'lexically bound free variable' from the *inner* function's perspective, which
-            #   - references the variable (not the object the variable points to!) in the outer scope
-            #   - uses the value of the outer scope variable at the time of the call (not at the time of definition!)
-            #   - can outlive the outer scope
-            #
-            #   Python achieves this by storing the variable-to-object mapping (cell object) of the variable
-            #   in the __closure__ property of the defined function.
-            #
-            #   Functions defined in the same outer scope share the *same* cell object for the same variables.
-            #
-            #   If the variable in the outer scope is made unavailable because the outer scope is closed or shadowed
-            #   (the latter happens during a recursive call), a new, separate cell object is created.
-            #
-            # More info:
-            #   https://stackoverflow.com/questions/12919278/how-to-define-free-variable-in-python
-            #   https://www.python.org/dev/peps/pep-0227/
-            #   https://gist.github.com/DmitrySoshnikov/700292
+        batch = self._emitter.batch
+
+        if type(msg) == bt2._StreamBeginningMessageConst:
+            batch.stream_classes.append(msg.stream.cls)
 
-            # Parse event classes
             for event_class in msg.stream.cls.values():
+                (layout, kinds, self._extract[event_class.id]) = payload_columns(event_class.payload_field_class)
+                batch.event_classes.append((event_class.id, event_class.name, layout, kinds))
+
+        if type(msg) == bt2._EventMessageConst:
+            # Save event to buffer, as column values - display strings are only built for displayed rows
+            event_id = msg.event.id
+            payload = msg.event.payload_field
+            values = []
+            self._extract[event_id](payload, values)
+            batch.rows.append((msg.default_clock_snapshot.value, event_id, values))
+            batch.counts[event_id] = batch.counts.get(event_id, 0) + 1
+            batch.payloads[event_id] = payload
+
+
+class ModelUpdater(QObject):
+    """
+    Applies event batches to the table and tree models, in the GUI thread.
+    """
+
+    def __init__(self, tableModel, treeModel, parent=None):
+        super().__init__(parent)
+        self._tableModel = tableModel
+        self._treeModel = treeModel
+
+        # event id -> model update handler
+        self._update = {}
+
+    @pyqtSlot(object)
+    def applyBatch(self, batch):
+        for stream_class in batch.stream_classes:
+            self._addStreamClass(stream_class)
+
+        for event_class in batch.event_classes:
+            self._tableModel.add_event_class(*event_class)
+
+        for (event_id, count) in batch.counts.items():
+            self._update[event_id](count, batch.payloads[event_id])
+
+        self._tableModel.extend(batch.rows)
 
-                # Parse field classes + attach update handlers recursively
-                def parse_field_class(parent_item, child_class, child_columns):
-
-                    # Create QStandardItem objects for columns and make them available as attributes of first column
-                    # (which is also the node of this level)
-                    (class_item, class_item.type, class_item.count, class_item.last_value) = column_items = [
-                        QStandardItem(column) for column in child_columns
-                    ]
-                    parent_item.appendRow(column_items)
-
-                    # Set monospaced font for "last_value" column, for easier value comparison
-                    class_item.last_value.setFont(QFont("Monospace"))
-
-                    if any([type(child_class) == cls for cls in (
-                        field_class._BoolFieldClassConst,
-                        field_class._BitArrayFieldClassConst,
-                        field_class._StringFieldClassConst
-                    )]):
-                        def update_scalar(payload):
-                            # No need to bind item via default argument, since we go out of the outer scope
-                            class_item.last_value.setText(str(payload))
-                            return None  # No subelements, so no update view handler calls
-                        return (class_item, update_scalar)
-
-                    elif issubclass(type(child_class), field_class._IntegerFieldClassConst):
-                        def update_integer(payload):
-                            class_item.last_value.setText(f"{int(payload):6}")
-                            return None
-                        return (class_item, update_integer)
-
-                    elif issubclass(type(child_class), field_class._RealFieldClassConst):
-                        def update_integer(payload):
-                            class_item.last_value.setText("{:9.3f}".format(float(payload)))
-                            return None
-                        return (class_item, update_integer)
-
-                    elif type(child_class) == field_class._EnumerationFieldClassConst:
-                        # item     -> enum current state
-                        # children -> all enum states (name, value)
-                        for member in child_class.values():
+    def _addStreamClass(self, stream_class):
+        # Event class payload field parsing
+        #
+        # More info:
+        #
+        # Common Trace Format (CTF) documentation
+        #   https://diamon.org/ctf/
+        #
+        # C documentation for Stream / Event / Field classes
+        #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-stream-cls.html
+        #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-ev-cls.html
+        #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-ev-cls.html#api-tir-ev-cls-prop-p-fc
+        #   https://babeltrace.org/docs/v2.0/libbabeltrace2/group__api-tir-fc.html
+        #
+        # Python bindings
+        #   babeltrace-2.0.0/src/bindings/python/bt2/bt2/stream_class.py
+        #   babeltrace-2.0.0/src/bindings/python/bt2/bt2/field_class.py
+        #   babeltrace-2.0.0/src/bindings/python/bt2/bt2/field.py
+        #   babeltrace-2.0.0/tests/bindings/python/bt2/test_field.py
+        #
+        # text.details sink source
+        #   babeltrace-2.0.0/src/plugins/text/details/write.c
+        #       static void write_stream_class(struct details_write_ctx *ctx, const bt_stream_class *sc) definition
+        #       static void write_event_class(struct details_write_ctx *ctx, const bt_event_class *ec) definition
+        #       static void write_field_class(struct details_write_ctx *ctx, const bt_field_class *fc) definition
+        #
+        #
+        #   if type(msg) == bt2._StreamBeginningMessageConst:
+        #       list(msg.stream.cls.values())[0] ------------------------->  _EventClassConst
+        #                                                                     defined @ event_class.py
+        #       list(msg.stream.cls.values())[0].payload_field_class ----->  _[X]FieldClassConst
+        #                                                                     defined @ field_class.py:
+        #                                                                    _FIELD_CLASS_TYPE_TO_CONST_OBJ
+        #   if type(msg) == bt2._EventMessageConst:
+        #       list(msg.event.payload_field.values())[0] ---------------->  _[X]FieldConst
+        #                                                                     defined @ field.py:
+        #                                                                    _FIELD_CLASS_TYPE_TO_OBJ
+        # How the tree model + view update handlers are built:
+        #
+        # for event_class in msg.stream.cls.values()
+        #  |- calls parse_field_class(for toplevel field class, tree root node)
+        #      |
+        #      -> parse_field_class(current field class, parent tree node)
+        #      '   |- creates the class_item tree node for current field class & appends it to parent tree node
+        #      '   |- depending on the type of field class
+        #      '   '   |- starts traversal of any sub-field classes by
+        #      '   '   '  calling parse_field_class(sub-field class, class_item)
+        #      '   '   '   |
+        #      '   '   '   -> parse_field_class(...)
+        #      '   '   '         - [recursive operation]
+        #      '   '   |<------- - returns (tree node for sub-field class, payload handler for sub-field class)
+        #      '   '   |
+        #      '   '   | (the sub-field payload handlers are stored)
+        #      '   '   |
+        #      '   '   |- creates payload handler for current field class, which will later, at the time of call,
+        #      '   '   '  be provided with the payload field which corresponds to the field class at the time of
+        #      '   '   '  handler creation in parse_field_class(...)
+        #      '   '   '  The payload handler
+        #      '   '   '   |- updates the tree node of the current field class
+        #      '   '   '   |  (+ notifies the view, done internally by QStandardItem)
+        #      '   '   '   |- unpacks the current payload field into sub-fields and
+        #      '   '   '   |- calls corresponding sub-field handlers for the unpacked sub-fields
+        #      '   '   '
+        #  |<----------|- returns the (class_item tree node, payload handler)
+        #  |
+        #  |- on event_class level only, augments the retrieved payload handler by defining a new handler,
+        #  |  which
+        #  |   |- handles event counting functionality (increments counter + updates the Count column)
+        #  |   |- calls the retrieved payload handler
+        #  |
+        #  |- stores the new payload handler in an [event.id]-indexed dict, which will be later used to call the
+        #     appropriate payload handler for a retrieved message in the _EventMessageConst stage
+        #
+        #
+        # The following code requires a solid understanding of python closures and since people usually stop at
+        # "closures in python are late binding", I want to elaborate on this:
+        #
+        #   When you define a function / lambda *in* a function, and the defined, *inner* function uses a variable
+        #   from the *outer* function scope,
+        #   that variable is a 'lexically bound free variable' from the *inner* function's perspective, which
+        #   - references the variable (not the object the variable points to!) in the outer scope
+        #   - uses the value of the outer scope variable at the time of the call (not at the time of definition!)
+        #   - can outlive the outer scope
+        #
+        #   Python achieves this by storing the variable-to-object mapping (cell object) of the variable
+        #   in the __closure__ property of the defined function.
+        #
+        #   Functions defined in the same outer scope share the *same* cell object for the same variables.
+        #
+        #   If the variable in the outer scope is made unavailable because the outer scope is closed or shadowed
+        #   (the latter happens during a recursive call), a new, separate cell object is created.
+        #
+        # More info:
+        #   https://stackoverflow.com/questions/12919278/how-to-define-free-variable-in-python
+        #   https://www.python.org/dev/peps/pep-0227/
+        #   https://gist.github.com/DmitrySoshnikov/700292
+
+        # Parse event classes
+        for event_class in stream_class.values():
+
+            # Parse field classes + attach update handlers recursively
+            def parse_field_class(parent_item, child_class, child_columns):
+
+                # Create QStandardItem objects for columns and make them available as attributes of first column
+                # (which is also the node of this level)
+                (class_item, class_item.type, class_item.count, class_item.last_value) = column_items = [
+                    QStandardItem(column) for column in child_columns
+                ]
+                parent_item.appendRow(column_items)
+
+                # Set monospaced font for "last_value" column, for easier value comparison
+                class_item.last_value.setFont(QFont("Monospace"))
+
+                if any([type(child_class) == cls for cls in (
+                    field_class._BoolFieldClassConst,
+                    field_class._BitArrayFieldClassConst,
+                    field_class._StringFieldClassConst
+                )]):
+                    def update_scalar(payload):
+                        # No need to bind item via default argument, since we go out of the outer scope
+                        class_item.last_value.setText(str(payload))
+                        return None  # No subelements, so no update view handler calls
+                    return (class_item, update_scalar)
+
+                elif issubclass(type(child_class), field_class._IntegerFieldClassConst):
+                    def update_integer(payload):
+                        class_item.last_value.setText(f"{int(payload):6}")
+                        return None
+                    return (class_item, update_integer)
+
+                elif issubclass(type(child_class), field_class._RealFieldClassConst):
+                    def update_integer(payload):
+                        class_item.last_value.setText("{:9.3f}".format(float(payload)))
+                        return None
+                    return (class_item, update_integer)
+
+                elif type(child_class) == field_class._EnumerationFieldClassConst:
+                    # item     -> enum current state
+                    # children -> all enum states (name, value)
+                    for member in child_class.values():
+                        parse_field_class(
+                            class_item, member.field_class,
+                            # "Name",     "Type",                             "Count", "Last Value"
+                            [member.name, type(member.field_class)._NAME[6:], '',      '-']
+                        )
+
+                    def update_enum(payload):
+                        class_item.last_value.setText(str(payload)) # TODO
+                    return (class_item, update_enum)
+
+                elif type(child_class) == field_class._ArrayFieldClass:
+                    # item     -> length, in-line state
+                    # children -> array elements
+                    # In case of dynamic arrays, the number of children can change! (Tree is modified!)
+                    def update_array(payload):
+                        class_item.last_value.setText(str(payload)) # TODO
+                    return (class_item, update_array)
+
+                elif type(child_class) == field_class._StructureFieldClassConst:
+                    # item      -> in-line state
+                    # children  -> structure elements
+
+                    sub_handler = []
+
+                    for member in child_class.values():
+                        sub_handler.append(
                             parse_field_class(
                                 class_item, member.field_class,
                                 # "Name",     "Type",                             "Count", "Last Value"
                                 [member.name, type(member.field_class)._NAME[6:], '',      '-']
-                            )
-
-                        def update_enum(payload):
-                            class_item.last_value.setText(str(payload)) # TODO
-                        return (class_item, update_enum)
-
-                    elif type(child_class) == field_class._ArrayFieldClass:
-                        # item     -> length, in-line state
-                        # children -> array elements
-                        # In case of dynamic arrays, the number of children can change! (Tree is modified!)
-                        def update_array(payload):
-                            class_item.last_value.setText(str(payload)) # TODO
-                        return (class_item, update_array)
-
-                    elif type(child_class) == field_class._StructureFieldClassConst:
-                        # item      -> in-line state
-                        # children  -> structure elements
-
-                        sub_handler = []
-
-                        for member in child_class.values():
-                            sub_handler.append(
-                                parse_field_class(
-                                    class_item, member.field_class,
-                                    # "Name",     "Type",                             "Count", "Last Value"
-                                    [member.name, type(member.field_class)._NAME[6:], '',      '-']
-                                )[1] # handler only
-                            )
-
-                        def update_struct(payload):
-                            # Update in-line info for container
-                            class_item.last_value.setText(str(payload))
-                            # Update members
-                            for shp in zip(sub_handler, payload.values()):
-                                shp[0](shp[1]) # sub handler for payload member ( payload member instance )
-                        return (class_item, update_struct)
-
-                    elif type(child_class) == field_class._OptionFieldClassConst:
-                        # item   -> option enabled flag, in-line state
-                        # child  -> option data struct, with values displayed if enabled
-                        def update_option(payload):
-                            class_item.last_value.setText(str(payload)) # TODO
-                        return (class_item, update_option)
-
-                    elif type(child_class) == field_class._VariantFieldClassConst:
-                        # item      -> selector, selected data struct, in-line state
-                        # children  -> all possible data structs, selected one has values displayed
-                        def update_variant(payload):
-                            class_item.last_value.setText(str(payload)) # TODO
-                        return (class_item, update_variant)
-
-                    else:
-                        print(f"{type(child_class)} not handled!")
-
-                (item, update_handler) = parse_field_class(
-                    self._treeModel.invisibleRootItem(), event_class.payload_field_class,
-                    # "Name",                                  "Type",                                          "Count", "Last Value"
-                    [f"{event_class.id} : {event_class.name}", type(event_class.payload_field_class)._NAME[6:], '0',     '-']
-                    # Do note that for "Type", we actually strip the "Const" prefix off _NAME to keep the column short
-                )
-
-                # Augment the payload handler with counting functionality
-                # Toplevel field class (event_class.payload_field_class) is in the same row as event class
-                #
-                # We need to bind the current iteration's item / update_handler objects via default arguments,
-                # since we remain in the same outer scope during for loop iterations.
-                item.count_value = 0
-                def update_event_class(payload, item=item, update_handler=update_handler):
-                    item.count_value += 1
-                    item.count.setText(str(item.count_value))
-
-                    update_handler(payload)
-
-                self._update[event_class.id] = update_event_class
-
-            # Notify view that the _treeModel changed
-            self._treeModel.modelReset.emit()
+                            )[1] # handler only
+                        )
+
+                    def update_struct(payload):
+                        # Update in-line info for container
+                        class_item.last_value.setText(str(payload))
+                        # Update members
+                        for shp in zip(sub_handler, payload.values()):
+                            shp[0](shp[1]) # sub handler for payload member ( payload member instance )
+                    return (class_item, update_struct)
+
+                elif type(child_class) == field_class._OptionFieldClassConst:
+                    # item   -> option enabled flag, in-line state
+                    # child  -> option data struct, with values displayed if enabled
+                    def update_option(payload):
+                        class_item.last_value.setText(str(payload)) # TODO
+                    return (class_item, update_option)
+
+                elif type(child_class) == field_class._VariantFieldClassConst:
+                    # item      -> selector, selected data struct, in-line state
+                    # children  -> all possible data structs, selected one has values displayed
+                    def update_variant(payload):
+                        class_item.last_value.setText(str(payload)) # TODO
+                    return (class_item, update_variant)
+
+                else:
+                    print(f"{type(child_class)} not handled!")
+
+            (item, update_handler) = parse_field_class(
+                self._treeModel.invisibleRootItem(), event_class.payload_field_class,
+                # "Name",                                  "Type",                                          "Count", "Last Value"
+                [f"{event_class.id} : {event_class.name}", type(event_class.payload_field_class)._NAME[6:], '0',     '-']
+                # Do note that for "Type", we actually strip the "Const" prefix off _NAME to keep the column short
+            )
+
+            # Augment the payload handler with counting functionality
+            # Toplevel field class (event_class.payload_field_class) is in the same row as event class
+            #
+            # We need to bind the current iteration's item / update_handler objects via default arguments,
+            # since we remain in the same outer scope during for loop iterations.
+            item.count_value = 0
+            def update_event_class(count, payload, item=item, update_handler=update_handler):
+                item.count_value += count
+                item.count.setText(str(item.count_value))
+
+                update_handler(payload)
+
+            self._update[event_class.id] = update_event_class
+
+        # Notify view that the _treeModel changed
+        self._treeModel.modelReset.emit()
 
-        if type(msg) == bt2._EventMessageConst:
-            # Save event to buffer
-            self._tableModel.append((msg.default_clock_snapshot.value, msg.event.name, str(msg.event.payload_field)))
-            self._update[msg.event.id](msg.event.payload_field)
 
 # MainWindow
 #
@@ -287,6 +451,7 @@ class MainWindow(QMainWindow):
 
         self._tableView.setEditTriggers(QTableWidget.NoEditTriggers)    # read-only
         self._tableView.verticalHeader().setDefaultSectionSize(10)      # row height
+        self._tableView.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # no per row height computation
         self._tableView.horizontalHeader().setStretchLastSection(True)  # last column resizes to widget width
 
         # Tree view
@@ -345,7 +510,7 @@ class MainWindow(QMainWindow):
     def timerEvent(self, QTimerEvent):
 
         # Statistics
-        self._statLabel.setText(f"Events (processed/loaded): {len(self._tableModel._table)} / {self._tableModel.rowCount()}")
+        self._statLabel.setText(f"Events (processed/loaded): {self._tableModel.eventCount()} / {self._tableModel.rowCount()}")
 
         # Follow events
         if self._followCheckbox.isChecked():
@@ -356,13 +521,14 @@ class MainWindow(QMainWindow):
 
 # GUI Application
 def main():
-    global CANSource_data_path, CANSource_dbc_path
+    global CANSource_data_path, CANSource_dbc_path, event_log
     global plugins
 
     app = QApplication([])
 
-    # Data models
-    tableModel = AppendableTableModel(('Timestamp', 'Event', 'Payload'))
+    # Data models, events are kept on disk if requested, so their count is only limited by disk space
+    storage = DiskEventStorage(event_log) if event_log else None
+    tableModel = AppendableTableModel(('Timestamp', 'Event', 'Payload'), storage)
 
     treeModel = QStandardItemModel()
     treeModel.setHorizontalHeaderLabels(("Name", "Type", "Count", "Last Value"))
@@ -378,7 +544,8 @@ def main():
        })
     )
 
-    graph_sink = graph.add_component(EventBufferSink, 'sink', obj=(tableModel, treeModel))
+    emitter = BatchEmitter(EventBatch, EventBatch.prepare)
+    graph_sink = graph.add_component(EventBufferSink, 'sink', obj=emitter)
 
     # Connect components together
     graph.connect_ports(
@@ -389,35 +556,38 @@ def main():
     # Main window
     mainWindow = MainWindow(tableModel, treeModel)
 
-    # Run graph as part of the GUI event loop
-    # https://stackoverflow.com/questions/36988826/running-code-in-the-main-loop
-    graph_timer = QTimer()
+    # Event batches are applied to the models in the gui thread
+    modelUpdater = ModelUpdater(tableModel, treeModel)
+    emitter.batchReady.connect(modelUpdater.applyBatch)
 
-    def run_graph():
-        try:
-            graph.run_once()
-        except bt2.Stop:
-            print("Graph finished execution.")
-            graph_timer.stop()
-
-    graph_timer.timeout.connect(run_graph)
-    graph_timer.start()
+    # Run graph in its own thread, so the GUI stays responsive
+    runner = GraphRunner(graph)
+    runner.graphFailed.connect(print)
+    app.aboutToQuit.connect(runner.requestInterruption)
+    runner.start()
 
     # Start GUI event loop
     mainWindow.show()
     mainWindow.startTimer(100)  # Update stats & table refresh interval in ms
 
     app.exec_()
+    runner.wait()
+    if storage is not None:
+        storage.close()
     print("Done.")
 
 
 if __name__ == "__main__":
-    global system_plugin_path, plugin_path
+    global system_plugin_path, plugin_path, list_plugins, no_plugin_cache, event_log
     global plugins
 
     # Parse command line and add parsed parameters to globals
     parser = cmd_parser(__doc__)
+    parser.add_argument(
+        "--event-log", type=str, default=None,
+        help="Keep the table events in this folder rather than in memory, for captures of any size"
+    )
     globals().update(vars(parser.parse_args()))
 
-    plugins = load_plugins(system_plugin_path, plugin_path)
+    plugins = load_plugins(system_plugin_path, plugin_path, verbose=list_plugins, cache=not no_plugin_cache)
     main()
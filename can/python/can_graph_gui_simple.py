@@ -18,34 +18,39 @@ from PyQt5.Qt import *
 from PyQt5.QtWidgets import *
 
 # import local modules
+from graph.runner import BatchEmitter, GraphRunner
 from graph.utils import load_plugins, cmd_parser
 
 
 @bt2.plugin_component_class
 class SinkEmitter(bt2._UserSinkComponent):
     """
-    Sink component that adds received events to the provided QStandardItemModel.
+    Sink component that hands received events over to the GUI thread, in batches, via the provided BatchEmitter.
     """
 
     def __init__(self, config, params, obj):
         self._port = self._add_input_port("in")
-        self._tableModel, self._tableView = obj
+        self._emitter = obj
 
     def _user_graph_is_configured(self):
         self._it = self._create_message_iterator(self._port)
 
     def _user_consume(self):
-        msg = next(self._it)
+        # We are running in the graph thread, so we must not access gui objects
+        self._emitter.poll()
 
-        if type(msg) == bt2._EventMessageConst:
+        try:
+            msg = next(self._it)
+        except StopIteration:
+            self._emitter.flush()
+            raise
 
-            # We are running in the gui thread, so we can freely access / modify gui objects
-            self._tableModel.appendRow((
-                QStandardItem(str(msg.default_clock_snapshot.value)),   # Timestamp
-                QStandardItem(msg.event.name),                          # Event
-                QStandardItem(str(msg.event.payload_field))             # Payload
+        if type(msg) == bt2._EventMessageConst:
+            self._emitter.batch.append((
+                str(msg.default_clock_snapshot.value),   # Timestamp
+                msg.event.name,                          # Event
+                str(msg.event.payload_field)             # Payload
             ))
-            self._tableView.scrollToBottom()
 
 
 # GUI Application
@@ -81,7 +86,8 @@ def main():
        })
     )
 
-    graph_sink = graph.add_component(SinkEmitter, 'sink', obj=(tableModel, tableView))
+    emitter = BatchEmitter()
+    graph_sink = graph.add_component(SinkEmitter, 'sink', obj=emitter)
 
     # Connect components together
     graph.connect_ports(
@@ -89,34 +95,34 @@ def main():
         list(graph_sink.input_ports.values())[0]
     )
 
-    # Run graph as part of the GUI event loop
-    # https://stackoverflow.com/questions/36988826/running-code-in-the-main-loop
-    graph_timer = QTimer()
-
-    def run_graph():
-        try:
-            graph.run_once()
-        except bt2.Stop:
-            print("Graph finished execution.")
-            graph_timer.stop()
+    # Add event batches to the model, in the gui thread
+    def append_rows(rows):
+        for row in rows:
+            tableModel.appendRow([QStandardItem(column) for column in row])
+        tableView.scrollToBottom()
 
-    graph_timer.timeout.connect(run_graph)
-    graph_timer.start()
+    emitter.batchReady.connect(append_rows)
 
+    # Run graph in its own thread, so the GUI stays responsive
+    runner = GraphRunner(graph)
+    runner.graphFailed.connect(print)
+    app.aboutToQuit.connect(runner.requestInterruption)
+    runner.start()
 
     # Start GUI event loop
     tableView.show()
     app.exec_()
+    runner.wait()
 
     print("Done.")
 
 if __name__ == "__main__":
-    global system_plugin_path, plugin_path
+    global system_plugin_path, plugin_path, list_plugins, no_plugin_cache
     global plugins
 
     # Parse command line and add parsed parameters to globals
     parser = cmd_parser(__doc__)
     globals().update(vars(parser.parse_args()))
 
-    plugins = load_plugins(system_plugin_path, plugin_path)
+    plugins = load_plugins(system_plugin_path, plugin_path, verbose=list_plugins, cache=not no_plugin_cache)
     main()
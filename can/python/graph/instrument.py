@@ -0,0 +1,252 @@
+"""
+Pass-through instrumentation filter, which can be inserted between any two components of a BT2 graph.
+
+It forwards messages unchanged, while recording:
+  - message counts per message type and per event class,
+  - the trace time vs wall time rate,
+  - the time spent waiting on the upstream message iterator, and its histogram (power of 2 buckets, in ns).
+
+A report is periodically written to stderr, or appended as a JSON line to a file, and once more when the graph
+is finalized.
+"""
+
+import bt2
+import itertools
+import json
+import sys
+import time
+
+
+# Messages between checks of whether a periodic report is due, a power of 2
+REPORT_CHECK_PERIOD = 1024
+
+
+class InstrumentStats:
+    """
+    Statistics shared by the Instrument component and its message iterator.
+    """
+
+    def __init__(self, name, interval, output):
+        self._name = name
+        self._interval_ns = int(interval * 1e9)
+        self._output = output
+
+        self.messages = 0
+        self.types = {}
+        self.event_classes = {}
+        self._event_class_names = {}
+
+        self.wait_ns = 0
+        # Histogram of upstream waits, bucket i counts the waits of [2^(i-1), 2^i) ns
+        self.wait_histogram = [0] * 65
+
+        self._start_ns = time.perf_counter_ns()
+        self._first_trace_ns = None
+        self._last_trace_ns = None
+        # Latest event message, whose time is only computed when reporting
+        self._last_event = None
+
+        # State at the previous report, for interval rates
+        self._report_ns = self._start_ns
+        self._report_messages = 0
+        self._report_trace_ns = None
+
+    def record(self, msg):
+        self.messages += 1
+
+        msg_type = type(msg)
+        self.types[msg_type] = self.types.get(msg_type, 0) + 1
+
+        if msg_type is bt2._EventMessageConst:
+            event_class = msg.event.cls
+            addr = event_class.addr
+            count = self.event_classes.get(addr)
+            if count is None:
+                self._event_class_names[addr] = event_class.name
+                count = 0
+            self.event_classes[addr] = count + 1
+
+            if self._first_trace_ns is None:
+                self._first_trace_ns = self._trace_ns(msg)
+            self._last_event = msg
+
+        # Checking the wall time of every message would cost more than the rest of the instrumentation
+        if self.messages & (REPORT_CHECK_PERIOD - 1) == 0 and self._interval_ns > 0:
+            if time.perf_counter_ns() - self._report_ns >= self._interval_ns:
+                self.report()
+
+    @staticmethod
+    def _trace_ns(msg):
+        try:
+            return msg.default_clock_snapshot.ns_from_origin
+        except Exception:
+            # No default clock, or its snapshot can't be expressed from origin
+            return None
+
+    def snapshot(self):
+        """
+        Returns the current statistics as a JSON-serializable dict.
+        """
+        if self._last_event is not None:
+            self._last_trace_ns = self._trace_ns(self._last_event)
+
+        now_ns = time.perf_counter_ns()
+        wall_s = (now_ns - self._start_ns) / 1e9
+        interval_s = (now_ns - self._report_ns) / 1e9
+
+        trace_s = None
+        trace_rate = None
+        if self._first_trace_ns is not None and self._last_trace_ns is not None:
+            trace_s = (self._last_trace_ns - self._first_trace_ns) / 1e9
+            trace_rate = trace_s / wall_s if wall_s > 0 else None
+
+        interval_trace_rate = None
+        if self._report_trace_ns is not None and self._last_trace_ns is not None and interval_s > 0:
+            interval_trace_rate = (self._last_trace_ns - self._report_trace_ns) / 1e9 / interval_s
+
+        # Type names without the bt2 decorations, e.g. _EventMessageConst -> EventMessage
+        types = {
+            msg_type.__name__.lstrip("_").replace("Const", ""): count
+            for (msg_type, count) in self.types.items()
+        }
+        event_classes = {}
+        for (addr, count) in self.event_classes.items():
+            name = self._event_class_names[addr]
+            event_classes[name] = event_classes.get(name, 0) + count
+
+        last_bucket = max((i for (i, count) in enumerate(self.wait_histogram) if count), default=-1)
+        histogram = {
+            f"<{1 << i}ns": count for (i, count) in enumerate(self.wait_histogram[:last_bucket + 1])
+        }
+
+        return {
+            "name": self._name,
+            "wall_s": wall_s,
+            "messages": self.messages,
+            "messages_per_s": self.messages / wall_s if wall_s > 0 else None,
+            "interval_messages_per_s": (self.messages - self._report_messages) / interval_s if interval_s > 0 else None,
+            "types": types,
+            "event_classes": event_classes,
+            "trace_s": trace_s,
+            "trace_rate": trace_rate,
+            "interval_trace_rate": interval_trace_rate,
+            "upstream_wait_s": self.wait_ns / 1e9,
+            "upstream_wait_histogram": histogram,
+        }
+
+    def release(self):
+        self._last_event = None
+
+    def report(self, final=False):
+        stats = self.snapshot()
+        stats["final"] = final
+
+        if self._output:
+            with open(self._output, "a") as f:
+                f.write(json.dumps(stats) + "\n")
+        else:
+            print(self._format(stats), file=sys.stderr)
+
+        self._report_ns = time.perf_counter_ns()
+        self._report_messages = self.messages
+        self._report_trace_ns = self._last_trace_ns
+
+    @staticmethod
+    def _format(stats):
+        def rate(value, fmt):
+            return "-" if value is None else format(value, fmt)
+
+        lines = [
+            f"[{stats['name']}] {'final' if stats['final'] else 'progress'}: "
+            f"{stats['messages']} messages in {stats['wall_s']:.3f} s "
+            f"({rate(stats['messages_per_s'], '.0f')}/s, {rate(stats['interval_messages_per_s'], '.0f')}/s lately), "
+            f"trace/wall rate {rate(stats['trace_rate'], '.3f')} ({rate(stats['interval_trace_rate'], '.3f')} lately), "
+            f"upstream wait {stats['upstream_wait_s']:.3f} s",
+            "  types: " + ", ".join(f"{name}={count}" for (name, count) in stats["types"].items()),
+        ]
+        if stats["event_classes"]:
+            lines.append(
+                "  event classes: " + ", ".join(f"{name}={count}" for (name, count) in stats["event_classes"].items())
+            )
+        lines.append(
+            "  upstream wait histogram: "
+            + ", ".join(f"{bucket}={count}" for (bucket, count) in stats["upstream_wait_histogram"].items() if count)
+        )
+        return "\n".join(lines)
+
+
+class InstrumentIterator(bt2._UserMessageIterator):
+    def __init__(self, config, port):
+        input_port, self._stats = port.user_data
+        self._upstream = self._create_message_iterator(input_port)
+
+    def __next__(self):
+        stats = self._stats
+
+        start = time.perf_counter_ns()
+        try:
+            msg = next(self._upstream)
+        finally:
+            # Also accounts for the waits ending with TryAgain or the end of the iteration
+            wait = time.perf_counter_ns() - start
+            stats.wait_ns += wait
+            stats.wait_histogram[wait.bit_length()] += 1
+
+        stats.record(msg)
+        return msg
+
+    # Seeking is forwarded, so the filter can also be inserted upstream of a trimmer
+
+    def _user_can_seek_beginning(self):
+        return self._upstream.can_seek_beginning()
+
+    def _user_seek_beginning(self):
+        self._upstream.seek_beginning()
+
+    def _user_can_seek_ns_from_origin(self, ns_from_origin):
+        return self._upstream.can_seek_ns_from_origin(ns_from_origin)
+
+    def _user_seek_ns_from_origin(self, ns_from_origin):
+        self._upstream.seek_ns_from_origin(ns_from_origin)
+
+
+@bt2.plugin_component_class
+class Instrument(bt2._UserFilterComponent, message_iterator_class=InstrumentIterator):
+    """
+    Pass-through instrumentation filter.
+
+    Parameters:
+      - interval: seconds between periodic reports, 0 for the final report only (default: 1.0)
+      - output: file to which reports are appended as JSON lines (default: text reports on stderr)
+    """
+
+    def __init__(self, config, params, obj):
+        interval = float(params["interval"]) if "interval" in params else 1.0
+        output = str(params["output"]) if "output" in params else None
+
+        self._stats = InstrumentStats(self.name, interval, output)
+
+        input_port = self._add_input_port("in")
+        self._add_output_port("out", (input_port, self._stats))
+
+    def _user_finalize(self):
+        self._stats.report(final=True)
+        self._stats.release()
+
+
+_instrument_names = itertools.count()
+
+
+def connect_instrumented(graph, upstream_port, downstream_port, params=None):
+    """
+    Connects `upstream_port` to `downstream_port` through a new Instrument component.
+    """
+    instrument = graph.add_component(
+        Instrument, f"instrument-{next(_instrument_names)}",
+        params=bt2.MapValue(params or {})
+    )
+
+    graph.connect_ports(upstream_port, list(instrument.input_ports.values())[0])
+    graph.connect_ports(list(instrument.output_ports.values())[0], downstream_port)
+
+    return instrument
@@ -3,12 +3,266 @@ Custom data models, intended to be filled by BT2 sinks, and displayed in Qt View
 https://doc.qt.io/qt-5/model-view-programming.html
 """
 
+import collections
+import mmap
+import os
+import struct
+from array import array
+
 from PyQt5.Qt import Qt, QAbstractTableModel, QModelIndex
 
 
+class EventClass:
+    """
+    Event class of the table, with the description of its payload:
+      - layout: a leaf field is the index of its column, a structure field is a list of (member name, layout),
+      - kinds: the type of each column,
+          'q' / 'Q' - signed / unsigned integer
+          'd'       - real
+          '?'       - bool
+          's'       - string
+          'r'       - any other field, stored already formatted
+    Payloads are handled as flat lists of column values, in layout order.
+    """
+
+    def __init__(self, name, layout, kinds):
+        self.name = name
+        self.layout = layout
+        self.kinds = kinds
+
+        # Binary encoding, for disk storage: fixed width columns, then length prefixed UTF-8 strings
+        self._fixed = struct.Struct('<' + ''.join(kind for kind in kinds if kind not in 'sr'))
+        self._strings = [kind in 'sr' for kind in kinds]
+
+    def format(self, values):
+        """
+        Formats payload column values, like the payload field would be.
+        """
+        return self._format(self.layout, values)
+
+    def _format(self, layout, values):
+        if isinstance(layout, list):
+            return '{' + ', '.join(f'{name!r}: {self._format(member, values)}' for (name, member) in layout) + '}'
+
+        value = values[layout]
+        kind = self.kinds[layout]
+        if kind == 'r':
+            return value
+        if kind == '?':
+            return repr(bool(value))
+        return repr(value)
+
+    def encode(self, values):
+        data = [self._fixed.pack(*(value for (value, string) in zip(values, self._strings) if not string))]
+        for (value, string) in zip(values, self._strings):
+            if string:
+                encoded = value.encode()
+                data.append(len(encoded).to_bytes(4, 'little'))
+                data.append(encoded)
+        return b''.join(data)
+
+    def decode(self, buffer, offset):
+        fixed = iter(self._fixed.unpack_from(buffer, offset))
+        offset += self._fixed.size
+
+        values = []
+        for string in self._strings:
+            if string:
+                length = int.from_bytes(buffer[offset:offset + 4], 'little')
+                values.append(bytes(buffer[offset + 4:offset + 4 + length]).decode())
+                offset += 4 + length
+            else:
+                values.append(next(fixed))
+        return values
+
+
+class EventClassColumns:
+    """
+    Columnar storage of the payloads of one event class, in memory.
+
+    Integer, real and bool columns are typed arrays, repeated values of string columns are shared.
+    """
+
+    # Distinct values of a string column that are shared rather than stored for each event
+    MAX_INTERNED = 4096
+
+    def __init__(self, kinds):
+        self._columns = [array('b') if kind == '?' else [] if kind in 'sr' else array(kind) for kind in kinds]
+        self._interned = [{} if kind in 'sr' else None for kind in kinds]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, values):
+        for (column, interned, value) in zip(self._columns, self._interned, values):
+            if interned is not None:
+                shared = interned.get(value)
+                if shared is not None:
+                    value = shared
+                elif len(interned) < self.MAX_INTERNED:
+                    interned[value] = value
+            column.append(value)
+
+        self._count += 1
+
+    def values(self, index):
+        return [column[index] for column in self._columns]
+
+
+class MemoryEventStorage:
+    """
+    Event storage in memory: timestamps and event classes in typed arrays, payloads in the EventClassColumns of
+    their event class.
+    """
+
+    def __init__(self):
+        self.event_classes = []
+        self._payloads = []
+
+        self._timestamps = array('Q')
+        self._classes = array('l')      # index in self.event_classes
+        self._class_rows = array('l')   # index in the EventClassColumns of the event class
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def add_event_class(self, event_class):
+        self.event_classes.append(event_class)
+        self._payloads.append(EventClassColumns(event_class.kinds))
+        return len(self.event_classes) - 1
+
+    def append(self, timestamp, class_index, values):
+        payloads = self._payloads[class_index]
+
+        self._timestamps.append(timestamp)
+        self._classes.append(class_index)
+        self._class_rows.append(len(payloads))
+        payloads.append(values)
+
+    def timestamp(self, row):
+        return self._timestamps[row]
+
+    def event_class(self, row):
+        return self.event_classes[self._classes[row]]
+
+    def values(self, row):
+        return self._payloads[self._classes[row]].values(self._class_rows[row])
+
+
+class DiskEventStorage:
+    """
+    Event storage on disk, for unbounded event counts.
+
+    Events are appended to a log of encoded payloads (`events.log`), and to an index of fixed width entries
+    (`events.idx`: timestamp, log offset, event class), so any row is found directly from its number. Both files
+    are read through memory maps. The last `hot_rows` appended events are kept in memory, and written out at once.
+    """
+
+    INDEX_ENTRY = struct.Struct('<QQI')
+
+    def __init__(self, directory, hot_rows=65536):
+        os.makedirs(directory, exist_ok=True)
+        self._index_file = open(os.path.join(directory, 'events.idx'), 'w+b')
+        self._log_file = open(os.path.join(directory, 'events.log'), 'w+b')
+        self._hot_rows = hot_rows
+
+        self.event_classes = []
+
+        # Written out events, and their memory maps (mapped again when more events are written out)
+        self._disk_rows = 0
+        self._disk_log_size = 0
+        self._index_map = None
+        self._log_map = None
+
+        # Events not written out yet
+        self._hot_index = bytearray()
+        self._hot_log = bytearray()
+
+    def __len__(self):
+        return self._disk_rows + len(self._hot_index) // self.INDEX_ENTRY.size
+
+    def add_event_class(self, event_class):
+        self.event_classes.append(event_class)
+        return len(self.event_classes) - 1
+
+    def append(self, timestamp, class_index, values):
+        offset = self._disk_log_size + len(self._hot_log)
+        self._hot_index += self.INDEX_ENTRY.pack(timestamp, offset, class_index)
+        self._hot_log += self.event_classes[class_index].encode(values)
+
+        if len(self._hot_index) >= self._hot_rows * self.INDEX_ENTRY.size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out the events kept in memory.
+        """
+        if not self._hot_index:
+            return
+
+        self._index_file.write(self._hot_index)
+        self._log_file.write(self._hot_log)
+        self._index_file.flush()
+        self._log_file.flush()
+
+        self._disk_rows += len(self._hot_index) // self.INDEX_ENTRY.size
+        self._disk_log_size += len(self._hot_log)
+        self._hot_index = bytearray()
+        self._hot_log = bytearray()
+
+        self._unmap()
+
+    def close(self):
+        self.flush()
+        self._unmap()
+        self._index_file.close()
+        self._log_file.close()
+
+    def _unmap(self):
+        for m in (self._index_map, self._log_map):
+            if isinstance(m, mmap.mmap):
+                m.close()
+        self._index_map = None
+        self._log_map = None
+
+    def _entry(self, row):
+        """
+        Returns (timestamp, log offset, event class index, buffer holding the payload, offset of the buffer).
+        """
+        if row >= self._disk_rows:
+            entry = self.INDEX_ENTRY.unpack_from(self._hot_index, (row - self._disk_rows) * self.INDEX_ENTRY.size)
+            return (*entry, self._hot_log, self._disk_log_size)
+
+        if self._index_map is None:
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            # Empty files can't be mapped, as when no written out event has a payload
+            if self._disk_log_size > 0:
+                self._log_map = mmap.mmap(self._log_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._log_map = b''
+
+        entry = self.INDEX_ENTRY.unpack_from(self._index_map, row * self.INDEX_ENTRY.size)
+        return (*entry, self._log_map, 0)
+
+    def timestamp(self, row):
+        return self._entry(row)[0]
+
+    def event_class(self, row):
+        return self.event_classes[self._entry(row)[2]]
+
+    def values(self, row):
+        (_, offset, class_index, buffer, buffer_offset) = self._entry(row)
+        return self.event_classes[class_index].decode(buffer, offset - buffer_offset)
+
+
 class AppendableTableModel(QAbstractTableModel):
     """
-    Table model with fetchMore mechanism for on-demand row loading.
+    Table model of events (Timestamp, Event, Payload), with fetchMore mechanism for on-demand row loading.
+
+    Events are kept in a storage backend, MemoryEventStorage by default, or DiskEventStorage for unbounded event
+    counts. Display strings are only formatted when the view asks for them, and the payload strings of the last
+    displayed rows are cached.
 
     More info
       https://doc.qt.io/qt-5/qabstracttablemodel.html
@@ -18,10 +272,16 @@ class AppendableTableModel(QAbstractTableModel):
       PyQt5-5.14.2.devX/examples/multimediawidgets/player.py
     """
 
-    def __init__(self, headers, parent=None):
+    # Number of formatted payloads kept
+    PAYLOAD_CACHE_SIZE = 1024
+
+    def __init__(self, headers, storage=None, parent=None):
         super().__init__(parent)
 
-        self._table = []
+        self._storage = storage if storage is not None else MemoryEventStorage()
+        self._event_class_index = {}    # event class key -> index in the storage
+
+        self._payload_cache = collections.OrderedDict()  # row -> formatted payload, in LRU order
 
         self._data_headers = headers
         self._data_columnCount = len(self._data_headers)  # Displayed column count
@@ -33,13 +293,41 @@ class AppendableTableModel(QAbstractTableModel):
     def columnCount(self, parent):
         return self._data_columnCount
 
+    def eventCount(self):
+        """
+        Number of stored events, displayed or not yet.
+        """
+        return len(self._storage)
+
     def data(self, index, role=Qt.DisplayRole):
-        if role == Qt.DisplayRole and index.isValid() and self._table:
+        if role == Qt.DisplayRole and index.isValid() and len(self._storage):
             # This is where we return data to be displayed
-            return str(self._table[index.row()][index.column()])
+            row = index.row()
+            column = index.column()
+
+            if column == 0:
+                return str(self._storage.timestamp(row))
+            if column == 1:
+                return self._storage.event_class(row).name
+            if column == 2:
+                return self._payload(row)
 
         return None
 
+    def _payload(self, row):
+        cache = self._payload_cache
+
+        text = cache.get(row)
+        if text is not None:
+            cache.move_to_end(row)
+            return text
+
+        text = self._storage.event_class(row).format(self._storage.values(row))
+        cache[row] = text
+        if len(cache) > self.PAYLOAD_CACHE_SIZE:
+            cache.popitem(last=False)
+        return text
+
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
             if orientation == Qt.Horizontal and section < len(self._data_headers):
@@ -49,23 +337,44 @@ class AppendableTableModel(QAbstractTableModel):
         return None
 
     def canFetchMore(self, index):
-        return self._data_rowCount < len(self._table)
+        return self._data_rowCount < len(self._storage)
 
     def fetchMore(self, index):
-        itemsToFetch = len(self._table) - self._data_rowCount
+        itemsToFetch = len(self._storage) - self._data_rowCount
 
         self.beginInsertRows(QModelIndex(), self._data_rowCount + 1, self._data_rowCount + itemsToFetch)
         self._data_rowCount += itemsToFetch
         self.endInsertRows()
 
+    def add_event_class(self, key, name, layout, kinds):
+        """
+        Declare an event class, before appending its events.
+        :param key: event class key, used by appended items
+        :param name: event class name, displayed in the Event column
+        :param layout, kinds: payload description, see EventClass
+        :return: None
+        """
+        self._event_class_index[key] = self._storage.add_event_class(EventClass(name, layout, kinds))
+
     def append(self, item_data):
         """
         Append item with provided item_data to end of table.
-        :param item_data: table view columns
+        :param item_data: (timestamp, event class key, payload column values)
         :return: None
         """
-        self._table.append(item_data)
+        self.extend((item_data,))
+
+    def extend(self, items_data):
+        """
+        Append a batch of items to end of table, notifying the view once.
+        :param items_data: list of (timestamp, event class key, payload column values)
+        :return: None
+        """
+        was_empty = not len(self._storage)
+
+        for (timestamp, key, values) in items_data:
+            self._storage.append(timestamp, self._event_class_index[key], values)
 
-        # If first element, notify view so that it starts updating
-        if len(self._table) == 1:
+        # If first elements, notify view so that it starts updating
+        if was_empty and len(self._storage):
             self.modelReset.emit()
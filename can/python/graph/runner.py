@@ -0,0 +1,79 @@
+"""
+Running BT2 graphs off the GUI thread.
+
+The graph runs in a QThread, so decoding never blocks the GUI. Sinks must not touch GUI objects from that thread:
+instead, they accumulate what they want to display in a batch, which BatchEmitter hands over to the GUI thread
+through a queued signal, at most every `interval` seconds.
+"""
+
+import bt2
+import time
+import traceback
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+
+class GraphRunner(QThread):
+    """
+    Thread running a graph until it finishes, fails, or the thread is asked to stop with requestInterruption().
+    """
+
+    # Emitted with the formatted traceback if the graph fails
+    graphFailed = pyqtSignal(str)
+
+    def __init__(self, graph, parent=None):
+        super().__init__(parent)
+        self._graph = graph
+
+    def run(self):
+        try:
+            # run_once() rather than run(), so interruption requests are checked between sink consumptions
+            while not self.isInterruptionRequested():
+                try:
+                    self._graph.run_once()
+                except bt2.TryAgain:
+                    self.msleep(1)
+                except bt2.Stop:
+                    print("Graph finished execution.")
+                    break
+        except Exception:
+            self.graphFailed.emit(traceback.format_exc())
+
+
+class BatchEmitter(QObject):
+    """
+    Hands over batches of data from the graph thread to the GUI thread.
+
+    The emitter is created in the GUI thread, so batchReady, emitted from the graph thread, is delivered as a
+    queued signal to the GUI thread slots connected to it.
+
+    The graph thread fills `batch` (created by `new_batch`, which must support len()), then calls poll(), which
+    emits it if `interval` seconds passed since the previous batch, and flush() when the graph ends. If given,
+    `prepare` is called (still in the graph thread) on every batch before it is emitted.
+    """
+
+    batchReady = pyqtSignal(object)
+
+    def __init__(self, new_batch=list, prepare=None, interval=0.05, parent=None):
+        super().__init__(parent)
+        self._new_batch = new_batch
+        self._prepare = prepare
+        self._interval = interval
+
+        self.batch = new_batch()
+        self._next_flush = time.monotonic() + interval
+
+    def poll(self):
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        self._next_flush = time.monotonic() + self._interval
+
+        if len(self.batch) == 0:
+            return
+
+        (batch, self.batch) = (self.batch, self._new_batch())
+        if self._prepare is not None:
+            self._prepare(batch)
+        self.batchReady.emit(batch)
@@ -4,9 +4,138 @@ Common functionality shared between can_graph examples.
 
 import bt2
 import argparse
+import collections.abc
+import json
+import os
 
 
-def load_plugins(system_plugin_path, plugin_path, verbose=True):
+def _plugin_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "babeltrace-fun-plugins", "plugins.json")
+
+
+def _plugin_cache_key(system_plugin_path, plugin_path):
+    """
+    Discovery results depend on the searched paths and on the babeltrace version.
+    """
+    return json.dumps([
+        os.path.abspath(system_plugin_path) if system_plugin_path else None,
+        None if system_plugin_path else os.environ.get("BABELTRACE_PLUGIN_PATH"),
+        os.path.abspath(plugin_path),
+        str(getattr(bt2, "__version__", None)),
+        os.stat(bt2.__file__).st_mtime_ns,
+    ])
+
+
+def _snapshot(roots, plugin_files):
+    """
+    Returns {path: mtime_ns} of the plugin files, of their directories and of all directories under `roots`,
+    so adding, removing or modifying a plugin changes the snapshot.
+    """
+    paths = set(plugin_files)
+    paths.update(os.path.dirname(path) for path in plugin_files)
+    for root in roots:
+        if os.path.isdir(root):
+            paths.update(dirpath for (dirpath, _, _) in os.walk(root))
+
+    snapshot = {}
+    for path in sorted(paths):
+        try:
+            snapshot[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            snapshot[path] = None
+    return snapshot
+
+
+def _is_fresh(snapshot):
+    for (path, mtime_ns) in snapshot.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            if mtime_ns is not None:
+                return False
+    return True
+
+
+class _LazyPlugins(collections.abc.Mapping):
+    """
+    Plugin dict backed by the discovery cache: {plugin name: plugin file}.
+    A plugin is only loaded, from its file, when first accessed.
+    """
+
+    def __init__(self, paths):
+        self._paths = paths
+        self._plugins = {}
+
+    def __getitem__(self, name):
+        if name not in self._plugins:
+            path = self._paths[name]
+            for plugin in bt2.find_plugins_in_path(path, recurse=False) or ():
+                if plugin.name == name:
+                    self._plugins[name] = plugin
+                    break
+            else:
+                raise KeyError(f"Plugin {name} not found in {path}, try --no-plugin-cache")
+
+        return self._plugins[name]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+
+def _discover_plugins(system_plugin_path, plugin_path):
+    """
+    Finds system & user plugins, returns (system plugins, user plugins, cache entry).
+    """
+    system_plugins = bt2.find_plugins_in_path(system_plugin_path) if system_plugin_path else bt2.find_plugins()
+    user_plugins = bt2.find_plugins_in_path(plugin_path)
+
+    assert system_plugins, "No system plugins found!"
+    assert user_plugins, "No user plugins found!"
+
+    system_paths = {plugin.name: plugin.path for plugin in system_plugins}
+    user_paths = {plugin.name: plugin.path for plugin in user_plugins}
+
+    roots = [plugin_path]
+    if system_plugin_path:
+        roots.append(system_plugin_path)
+    else:
+        roots.extend(filter(None, os.environ.get("BABELTRACE_PLUGIN_PATH", "").split(os.pathsep)))
+
+    entry = {
+        "system": system_paths,
+        "user": user_paths,
+        "snapshot": _snapshot(roots, [*system_paths.values(), *user_paths.values()]),
+    }
+    return (system_plugins, user_plugins, entry)
+
+
+def _read_plugin_cache():
+    try:
+        with open(_plugin_cache_path(), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_plugin_cache(cache):
+    path = _plugin_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so concurrent runs never see it half written
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Couldn't write plugin cache {path}: {e}")
+
+
+def load_plugins(system_plugin_path, plugin_path, verbose=False, cache=True):
     """
     Loads system & user plugins and returns them as a unified dict
 
@@ -15,15 +144,35 @@ def load_plugins(system_plugin_path, plugin_path, verbose=True):
 
     :param plugin_path: path to user plugins
 
+    :param verbose: list all found plugins and their components (loads all of them)
+
+    :param cache: use the discovery cache, which maps plugin names to their files. It is invalidated when
+        the plugin files or the directories holding them change, or when babeltrace is updated. On a hit,
+        only the plugins actually used are loaded.
+
     :return: dict with all found plugins
     """
 
-    # Load plugins
-    system_plugins = bt2.find_plugins_in_path(system_plugin_path) if system_plugin_path else bt2.find_plugins()
-    user_plugins = bt2.find_plugins_in_path(plugin_path)
+    key = _plugin_cache_key(system_plugin_path, plugin_path)
+    entries = _read_plugin_cache() if cache else {}
+    entry = entries.get(key)
 
-    assert system_plugins, "No system plugins found!"
-    assert user_plugins, "No user plugins found!"
+    if entry is not None and _is_fresh(entry["snapshot"]):
+        plugins = _LazyPlugins({**entry["system"], **entry["user"]})
+        system_plugins = [plugins[name] for name in entry["system"]] if verbose else None
+        user_plugins = [plugins[name] for name in entry["user"]] if verbose else None
+    else:
+        (system_plugins, user_plugins, entry) = _discover_plugins(system_plugin_path, plugin_path)
+
+        # Convert _PluginSet to dict
+        plugins = {
+            **{plugin.name: plugin for plugin in system_plugins},
+            **{plugin.name: plugin for plugin in user_plugins}
+        }
+
+        if cache:
+            entries[key] = entry
+            _write_plugin_cache(entries)
 
     if verbose:
         def describe_plugins(plugins):
@@ -47,12 +196,6 @@ def load_plugins(system_plugin_path, plugin_path, verbose=True):
         print('User specified plugins:')
         describe_plugins(user_plugins)
 
-    # Convert _PluginSet to dict
-    plugins = {
-        **{plugin.name: plugin for plugin in system_plugins},
-        **{plugin.name: plugin for plugin in user_plugins}
-    }
-
     return plugins
 
 
@@ -72,6 +215,14 @@ def cmd_parser(description):
         "--plugin-path", type=str, default="./",
         help="Path to 'bt_user_can.(so|py)' plugin"
     )
+    parser.add_argument(
+        "--list-plugins", action="store_true",
+        help="List all found plugins and their components"
+    )
+    parser.add_argument(
+        "--no-plugin-cache", action="store_true",
+        help="Don't use the plugin discovery cache, always search plugin paths"
+    )
     parser.add_argument(
         "--CANSource-data-path", type=str, default="../test.data",
         help="Path to test data required by bt_user_can"
@@ -1,13 +1,841 @@
+import bisect
 import bt2
+import calendar
+import collections
+import functools
+import hashlib
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
+import re
+import struct
+import traceback
+from array import array
 import xml.etree.ElementTree as etree
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+GPX_NS = "{http://www.topografix.com/GPX/1/1}"
+_GPX_TAG = GPX_NS + "gpx"
+_TRK_TAG = GPX_NS + "trk"
+_TRKSEG_TAG = GPX_NS + "trkseg"
+_TRKPT_TAG = GPX_NS + "trkpt"
+_ELE_TAG = GPX_NS + "ele"
+_TIME_TAG = GPX_NS + "time"
+
+# Start tags of the root element and of the tracks, for the pre-scan. Tags
+# may have a namespace prefix, the namespace itself is checked on the root
+# element, and by the parser.
+_GPX_START_RE = re.compile(rb"<(?:[\w.-]+:)?gpx[\s>][^>]*>")
+_TRK_START_RE = re.compile(rb"<(?:[\w.-]+:)?trk[\s>]")
+
+# Segment and track point start tags, track point end tags and times, for the
+# time index.
+_TRK_CHILD_START_RE = re.compile(rb"<(?:[\w.-]+:)?(trkseg|trkpt)(?=[\s>])[^>]*>")
+_TRKPT_END_RE = re.compile(rb"</(?:[\w.-]+:)?trkpt\s*>")
+_TIME_RE = re.compile(rb"<(?:[\w.-]+:)?time>([^<]*)</")
+
+# One track point out of _INDEX_STRIDE is in the time index.
+_INDEX_STRIDE = 256
+
+
+def _scan_tracks(path):
+    """
+    Cheaply finds the tracks of a GPX file, without parsing it.
+
+    Returns (prolog, extents), where `prolog` is everything up to and including
+    the root start tag (so namespaces are declared) and `extents` are the
+    (start, end) byte ranges of the tracks, from their `<trk>` start tag to
+    the next one (or the end of the file).
+    """
+    if os.path.getsize(path) == 0:
+        raise ValueError("GpxSource: {} is empty".format(path))
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            root = _GPX_START_RE.search(mm)
+            if root is None:
+                raise ValueError("GpxSource: {} is not a GPX file".format(path))
+
+            prolog = mm[: root.end()]
+            offsets = [m.start() for m in _TRK_START_RE.finditer(mm, root.end())]
+            ends = offsets[1:] + [len(mm)]
+
+    tag = _root_tag(prolog)
+    if tag != _GPX_TAG:
+        raise ValueError(
+            "GpxSource: {} has an unsupported root element {}, expecting {}".format(
+                path, tag, _GPX_TAG
+            )
+        )
+
+    return (prolog, list(zip(offsets, ends)))
+
+
+def _root_tag(prolog):
+    """
+    Returns the qualified tag of the root element started by `prolog`.
+    """
+    parser = etree.XMLPullParser(events=("start",))
+    try:
+        parser.feed(prolog)
+        for (event, elem) in parser.read_events():
+            return elem.tag
+    except etree.ParseError:
+        pass
+
+    return None
+
+
+class _PrefixedFile(object):
+    """
+    Read-only file object serving `prefix`, then the rest of `f`.
+    """
+
+    def __init__(self, prefix, f):
+        self._prefix = prefix
+        self._f = f
+
+    def read(self, size=-1):
+        if self._prefix:
+            data = self._prefix
+            self._prefix = b""
+            return data
+
+        return self._f.read(size)
+
+
+class _TimeParser(object):
+    """
+    Parses ISO 8601 timestamps (`YYYY-MM-DDTHH:MM:SS[.fraction][Z|+HH:MM]`)
+    into nanoseconds since the Unix epoch.
+
+    Consecutive points mostly share their date, or even their second when
+    sampled faster than 1 Hz, so those parts are memoized.
+    """
+
+    def __init__(self):
+        self._day = None
+        self._day_seconds = None
+        self._second = None
+        self._seconds = None
+
+    def parse(self, text):
+        text = text.strip()
+        if len(text) < 19 or text[10] not in "Tt ":
+            return self._parse_slow(text)
+
+        second = text[:19]
+        if second != self._second:
+            day = text[:10]
+            if day != self._day:
+                self._day_seconds = calendar.timegm(
+                    (int(day[0:4]), int(day[5:7]), int(day[8:10]), 0, 0, 0)
+                )
+                self._day = day
+
+            self._seconds = (
+                self._day_seconds
+                + int(text[11:13]) * 3600
+                + int(text[14:16]) * 60
+                + int(text[17:19])
+            )
+            self._second = second
+
+        ns = self._seconds * 1000000000
+
+        rest = text[19:]
+        if rest.startswith("."):
+            end = 1
+            while end < len(rest) and rest[end].isdigit():
+                end += 1
+            ns += int(rest[1:end][:9].ljust(9, "0"))
+            rest = rest[end:]
+
+        if rest and rest not in "Zz":
+            # +HH, +HHMM or +HH:MM
+            sign = 1 if rest[0] == "+" else -1
+            offset = int(rest[1:3]) * 3600
+            if len(rest) > 3:
+                offset += int(rest[-2:]) * 60
+            ns -= sign * offset * 1000000000
+
+        return ns
+
+    @staticmethod
+    def _parse_slow(text):
+        time = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        if time.tzinfo is None:
+            time = time.replace(tzinfo=timezone.utc)
+
+        delta = time - datetime(1970, 1, 1, tzinfo=timezone.utc)
+        return (
+            delta.days * 86400 + delta.seconds
+        ) * 1000000000 + delta.microseconds * 1000
+
+
+def _parse_trkpt(trkpt, time_parser):
+    lat = float(trkpt.attrib["lat"])
+    lon = float(trkpt.attrib["lon"])
+
+    # Single pass over the children, rather than a `find()` for each.
+    ele = None
+    time = None
+    for child in trkpt:
+        tag = child.tag
+        if tag == _ELE_TAG:
+            ele = child.text
+        elif tag == _TIME_TAG:
+            time = child.text
+
+    if time is None:
+        raise ValueError("GpxSource: track point without time")
+
+    ele = float("nan") if ele is None else float(ele)
+    return (lat, lon, ele, time_parser.parse(time))
+
+
+class _Selection(object):
+    """
+    Points selected by the `bbox` and `time-range` parameters of GpxSource.
+
+    `bbox` is None or (min lat, min lon, max lat, max lon), `begin` and `end`
+    are None or inclusive bounds in ns since the Unix epoch. Points of a track
+    are assumed to be in time order: reading a track stops at the first point
+    after `end`.
+
+    Extents, of a track or of a block of points, are
+    (min lat, min lon, max lat, max lon, min ts, max ts) tuples.
+    """
+
+    def __init__(self, bbox=None, begin=None, end=None):
+        self.bbox = bbox
+        self.begin = begin
+        self.end = end
+
+    def begin_at(self, begin):
+        """
+        Returns the time to seek to, to read from `begin` (possibly None).
+        """
+        if self.begin is None:
+            return begin
+        if begin is None:
+            return self.begin
+        return max(begin, self.begin)
+
+    def is_past(self, extent):
+        return self.end is not None and extent[4] > self.end
+
+    def overlaps(self, extent):
+        (min_lat, min_lon, max_lat, max_lon, min_ts, max_ts) = extent
+
+        if self.begin is not None and max_ts < self.begin:
+            return False
+        if self.end is not None and min_ts > self.end:
+            return False
+        if self.bbox is not None:
+            (bbox_min_lat, bbox_min_lon, bbox_max_lat, bbox_max_lon) = self.bbox
+            return (
+                min_lat <= bbox_max_lat
+                and max_lat >= bbox_min_lat
+                and min_lon <= bbox_max_lon
+                and max_lon >= bbox_min_lon
+            )
+        return True
+
+    def covers(self, extent):
+        (min_lat, min_lon, max_lat, max_lon, min_ts, max_ts) = extent
+
+        if self.begin is not None and min_ts < self.begin:
+            return False
+        if self.end is not None and max_ts > self.end:
+            return False
+        if self.bbox is not None:
+            (bbox_min_lat, bbox_min_lon, bbox_max_lat, bbox_max_lon) = self.bbox
+            return (
+                min_lat >= bbox_min_lat
+                and max_lat <= bbox_max_lat
+                and min_lon >= bbox_min_lon
+                and max_lon <= bbox_max_lon
+            )
+        return True
+
+    def filter(self, points):
+        """
+        Yields the (lat, lon, ele, ts) points of `points` which are selected.
+        """
+        begin = self.begin
+        end = self.end
+
+        if self.bbox is None:
+            (min_lat, min_lon, max_lat, max_lon) = (-90.0, -180.0, 90.0, 180.0)
+        else:
+            (min_lat, min_lon, max_lat, max_lon) = self.bbox
+
+        for point in points:
+            (lat, lon, _, ts) = point
+            if end is not None and ts > end:
+                return
+            if begin is not None and ts < begin:
+                continue
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                yield point
+
+
+@functools.lru_cache(maxsize=64)
+def _index_track(path, start, end, mtime_ns):
+    """
+    Builds the time index of the track between `start` and `end`, without
+    parsing it: returns (timestamps, offsets, resumes) of one point out of
+    _INDEX_STRIDE, `offsets` being the positions of their `<trkpt>` start tag
+    and `resumes` the start tags of their track and segment, as written in
+    the file, which reopen them to resume parsing from that point.
+
+    `mtime_ns` is only part of the memoization key, so a modified file is
+    indexed again.
+    """
+    time_parser = _TimeParser()
+    timestamps = array("q")
+    offsets = array("q")
+    resumes = []
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            trk = mm[start : mm.find(b">", start, end) + 1]
+            resume = None
+
+            i = -1
+            for m in _TRK_CHILD_START_RE.finditer(mm, start, end):
+                if m.group(1) == b"trkseg":
+                    resume = trk + m.group(0)
+                    continue
+
+                i += 1
+                if i % _INDEX_STRIDE != 0 or resume is None:
+                    continue
+
+                close = _TRKPT_END_RE.search(mm, m.end(), end)
+                time = _TIME_RE.search(mm, m.end(), end if close is None else close.start())
+                if time is None:
+                    continue
+
+                ts = time_parser.parse(time.group(1).decode())
+
+                # Only keep the index sorted, points out of order are found by
+                # the linear scan following the lookup.
+                if timestamps and ts < timestamps[-1]:
+                    continue
+
+                timestamps.append(ts)
+                offsets.append(m.start())
+                resumes.append(resume)
+
+    return (timestamps, offsets, resumes)
+
+
+def _iter_trkpts(path, prolog, start, end, begin=None, selection=None):
+    """
+    Yields (lat, lon, ele, ts) for each point of the track between `start`
+    and `end`, in constant memory: the file is streamed from that offset and
+    elements are dropped as soon as they are processed.
+
+    If `begin` is given, points before it are skipped: parsing starts from
+    the last indexed point before `begin`, rather than from the start of the
+    track. If `selection` is given, only the points it selects are yielded.
+    """
+    if selection is not None:
+        trkpts = _iter_trkpts(path, prolog, start, end, selection.begin_at(begin))
+        yield from selection.filter(trkpts)
+        return
+
+    if begin is None:
+        yield from _parse_trkpts(path, prolog, start)
+        return
+
+    (timestamps, offsets, resumes) = _index_track(
+        path, start, end, os.stat(path).st_mtime_ns
+    )
+    i = bisect.bisect_left(timestamps, begin) - 1
+    if i >= 0:
+        # Resume in the middle of a segment, in an opened track and segment.
+        trkpts = _parse_trkpts(path, prolog + resumes[i], offsets[i])
+    else:
+        trkpts = _parse_trkpts(path, prolog, start)
+
+    for point in trkpts:
+        if point[3] >= begin:
+            yield point
+            break
+
+    yield from trkpts
+
+
+def _parse_trkpts(path, prolog, offset):
+    with open(path, "rb") as f:
+        f.seek(offset)
+
+        time_parser = _TimeParser()
+        trkseg = None
+        for (event, elem) in etree.iterparse(
+            _PrefixedFile(prolog, f), events=("start", "end")
+        ):
+            if event == "start":
+                if elem.tag == _TRKSEG_TAG:
+                    trkseg = elem
+                continue
+
+            if elem.tag == _TRKPT_TAG:
+                yield _parse_trkpt(elem, time_parser)
+                trkseg.remove(elem)
+            elif elem.tag == _TRK_TAG:
+                return
+            elif elem.tag == _TRKSEG_TAG:
+                elem.clear()
+
+
+# Number of points sent at once by the parsing processes.
+_CHUNK_SIZE = 1024
+
+
+def _parse_worker(tasks, selection, conn):
+    """
+    Main loop of a parsing process.
+
+    Each request is a (session, key, begin) tuple, `key` being the index of a
+    task in `tasks`, a list of arguments to `_iter_trkpts`, and is answered
+    with (session, next chunk of points). A chunk shorter than _CHUNK_SIZE
+    ends the track. Since the tracks of all the sessions are parsed a chunk at
+    a time, no track can block another.
+
+    A None key ends the session, e.g. when the track is read again from
+    another time.
+    """
+    readers = {}
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+
+        if request is None:
+            return
+
+        (session, key, begin) = request
+
+        if key is None:
+            readers.pop(session, None)
+            continue
+
+        if session not in readers:
+            readers[session] = _iter_trkpts(
+                *tasks[key], begin=begin, selection=selection
+            )
+
+        reader = readers[session]
+        if reader is None:
+            conn.send((session, []))
+            continue
+
+        try:
+            chunk = list(itertools.islice(reader, _CHUNK_SIZE))
+        except Exception:
+            chunk = RuntimeError(traceback.format_exc())
+
+        if type(chunk) is not list or len(chunk) < _CHUNK_SIZE:
+            readers[session] = None
+
+        conn.send((session, chunk))
+
+
+class _ParsePool(object):
+    """
+    Processes parsing the tracks described by `tasks` in parallel, yielding
+    only the points selected by `selection`, if not None.
+
+    Points of each track are requested ahead of time, `depth` chunks at most,
+    so parsing overlaps with message creation while memory stays bounded.
+    """
+
+    def __init__(self, tasks, jobs, selection=None, depth=4):
+        # Forking is the only start method not relying on `sys.executable`,
+        # which is babeltrace2 itself when the plugin is loaded by the CLI.
+        # The tasks are inherited by the processes.
+        context = multiprocessing.get_context("fork")
+
+        self._depth = depth
+        self._sessions = itertools.count()
+        self._received = collections.defaultdict(collections.deque)
+        self._pending = collections.Counter()
+        self._abandoned = set()
+        self._workers = []
+
+        for i in range(min(jobs, len(tasks))):
+            (conn, child_conn) = context.Pipe()
+            process = context.Process(
+                target=_parse_worker,
+                args=(tasks, selection, child_conn),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._workers.append((process, conn))
+
+    def iter_trkpts(self, key, begin=None):
+        """
+        Yields the points of the track of task `key`, from `begin` if given.
+        """
+        conn = self._workers[key % len(self._workers)][1]
+        session = next(self._sessions)
+        request = (session, key, begin)
+
+        try:
+            for _ in range(self._depth):
+                self._send(conn, request)
+
+            while True:
+                chunk = self._receive(conn, session)
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                yield from chunk
+
+                if len(chunk) < _CHUNK_SIZE:
+                    return
+
+                self._send(conn, request)
+        finally:
+            self._abandon(conn, session)
+
+    def close(self):
+        for (process, conn) in self._workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+            process.join()
+
+        self._workers = []
+
+    def _send(self, conn, request):
+        # Stash responses already available, so the process is never blocked
+        # sending them while we are blocked sending to it.
+        while conn.poll():
+            self._stash(conn.recv())
+
+        conn.send(request)
+        self._pending[request[0]] += 1
+
+    def _receive(self, conn, session):
+        queue = self._received[session]
+        while not queue:
+            self._stash(conn.recv())
+
+        return queue.popleft()
+
+    def _stash(self, response):
+        (session, chunk) = response
+
+        self._pending[session] -= 1
+        if session not in self._abandoned:
+            self._received[session].append(chunk)
+        elif self._pending[session] == 0:
+            del self._pending[session]
+            self._abandoned.discard(session)
+
+    def _abandon(self, conn, session):
+        # Responses still in flight are dropped when received.
+        self._received.pop(session, None)
+        if self._pending[session] > 0:
+            self._abandoned.add(session)
+        else:
+            del self._pending[session]
+
+        try:
+            conn.send((session, None, None))
+        except (OSError, ValueError):
+            # The pool is already closed.
+            pass
+
+
+_CACHE_MAGIC = b"BTGPXC02"
+_CACHE_SUFFIX = ".btcache"
+
+# Number of points of the blocks whose extents are stored in caches.
+_BLOCK_SIZE = 4096
+
+
+def _hash_file(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_cache(path):
+    """
+    Parses all the tracks of `path` and writes them in a columnar cache file
+    next to it.
+
+    The cache is made of the magic, the length of the JSON header as a
+    little-endian u64, the header (source file size, mtime and hash, number
+    of points and extents of the blocks of _BLOCK_SIZE points of each track),
+    padding to a multiple of 8 bytes, then for each track its lat, lon and ele
+    as float64 and its timestamps as int64.
+    """
+    stat = os.stat(path)
+    (prolog, extents) = _scan_tracks(path)
+
+    tracks = []
+    for (start, end) in extents:
+        columns = (array("d"), array("d"), array("d"), array("q"))
+        appends = [column.append for column in columns]
+        for point in _iter_trkpts(path, prolog, start, end):
+            for (append, value) in zip(appends, point):
+                append(value)
+        tracks.append(columns)
+
+    header = json.dumps(
+        {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": _hash_file(path),
+            "counts": [len(columns[0]) for columns in tracks],
+            "extents": [_block_extents(columns) for columns in tracks],
+        }
+    ).encode()
+
+    # Written aside and renamed, so a cache is never seen half written.
+    cache_path = path + _CACHE_SUFFIX
+    tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(_CACHE_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (-f.tell() % 8))
+        for columns in tracks:
+            for column in columns:
+                column.tofile(f)
+
+    os.replace(tmp_path, cache_path)
+
+
+def _block_extents(columns):
+    (lats, lons, _, timestamps) = columns
+
+    extents = []
+    for start in range(0, len(lats), _BLOCK_SIZE):
+        block = slice(start, start + _BLOCK_SIZE)
+        extents.append(
+            (
+                min(lats[block]),
+                min(lons[block]),
+                max(lats[block]),
+                max(lons[block]),
+                min(timestamps[block]),
+                max(timestamps[block]),
+            )
+        )
+
+    return extents
+
+
+def _write_caches(paths, writer):
+    for path in paths:
+        try:
+            _write_cache(path)
+            writer.send(None)
+        except Exception:
+            writer.send(traceback.format_exc())
+    writer.close()
+
+
+def _build_caches(paths, jobs):
+    """
+    Writes the caches of `paths`, in `jobs` processes if more than 1.
+    Returns the list of (path, error).
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        errors = []
+        for path in paths:
+            try:
+                _write_cache(path)
+            except Exception:
+                errors.append((path, traceback.format_exc()))
+        return errors
+
+    context = multiprocessing.get_context("fork")
+
+    workers = []
+    for i in range(min(jobs, len(paths))):
+        group = paths[i::jobs]
+        (reader, writer) = context.Pipe(duplex=False)
+        process = context.Process(target=_write_caches, args=(group, writer))
+        process.start()
+        writer.close()
+        workers.append((process, reader, group))
+
+    errors = []
+    for (process, reader, group) in workers:
+        for path in group:
+            try:
+                error = reader.recv()
+            except EOFError:
+                process.join()
+                error = "process exited with code {}".format(process.exitcode)
+            if error is not None:
+                errors.append((path, error))
+        process.join()
+        reader.close()
+
+    return errors
+
+
+class _GpxCache(object):
+    """
+    Memory-mapped columnar cache of the tracks of a GPX file.
+    """
+
+    def __init__(self, mm, counts, extents, data_offset):
+        self._mm = mm
+        self._counts = counts
+        self._extents = extents
+        self._data_offset = data_offset
+
+    @staticmethod
+    def open(path):
+        """
+        Returns the cache of `path`, or None if it is missing or stale.
+        """
+        try:
+            f = open(path + _CACHE_SUFFIX, "rb")
+        except OSError:
+            return None
+
+        with f:
+            if os.fstat(f.fileno()).st_size < len(_CACHE_MAGIC) + 8:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if mm[: len(_CACHE_MAGIC)] != _CACHE_MAGIC:
+            return None
+
+        (length,) = struct.unpack_from("<Q", mm, len(_CACHE_MAGIC))
+        start = len(_CACHE_MAGIC) + 8
+        try:
+            header = json.loads(mm[start : start + length])
+        except ValueError:
+            return None
+
+        stat = os.stat(path)
+        if (
+            header["size"] != stat.st_size
+            or header["mtime_ns"] != stat.st_mtime_ns
+            or header["hash"] != _hash_file(path)
+        ):
+            return None
+
+        data_offset = start + length
+        data_offset += -data_offset % 8
+        counts = header["counts"]
+        if len(mm) != data_offset + 32 * sum(counts):
+            return None
+
+        return _GpxCache(mm, counts, header["extents"], data_offset)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def track(self, index):
+        """
+        Returns (lat, lon, ele, ts) memory views of track `index`.
+        """
+        n = self._counts[index]
+        offset = self._data_offset + 32 * sum(self._counts[:index])
+        mv = memoryview(self._mm)
+
+        columns = []
+        for typecode in "dddq":
+            columns.append(mv[offset : offset + 8 * n].cast(typecode))
+            offset += 8 * n
+
+        return tuple(columns)
+
+    def overlaps(self, index, selection):
+        """
+        Returns whether `selection` may select points of track `index`.
+        """
+        return any(selection.overlaps(extent) for extent in self._extents[index])
+
+    def iter_trkpts(self, index, begin=None, selection=None):
+        """
+        Yields the points of track `index`, from `begin` if given.
+
+        The timestamps column is the time index: the first point is found by
+        bisection, provided the points are in time order.
+
+        If `selection` is given, only the points it selects are yielded:
+        blocks outside of it are skipped and blocks inside of it are yielded
+        as is, using their extents.
+        """
+        columns = self.track(index)
+
+        if selection is not None:
+            begin = selection.begin_at(begin)
+
+        start = 0
+        if begin is not None:
+            start = bisect.bisect_left(columns[3], begin)
+
+        if selection is None:
+            yield from zip(*(column[start:] for column in columns))
+            return
+
+        for (i, extent) in enumerate(self._extents[index]):
+            if selection.is_past(extent):
+                return
+
+            block = slice(max(start, i * _BLOCK_SIZE), (i + 1) * _BLOCK_SIZE)
+            if block.start >= block.stop or not selection.overlaps(extent):
+                continue
+
+            points = zip(*(column[block] for column in columns))
+            if selection.covers(extent):
+                yield from points
+            else:
+                yield from selection.filter(points)
+
+
+def _create_trk_trace_class(component, members):
+    """
+    Creates the trace class of `component`, with a `trk` stream class having
+    a `trkpt` event class whose payload is made of the double `members`.
+    """
+    # Nanosecond resolution, so sub-second points keep distinct timestamps.
+    clock_class = component._create_clock_class(frequency=1000000000)
+    trace_class = component._create_trace_class()
+
+    sc = trace_class.create_stream_class(name="trk", default_clock_class=clock_class)
+
+    # 'trkpt' event
+    trkpt_payload = trace_class.create_structure_field_class()
+    for member in members:
+        trkpt_payload.append_member(
+            member, trace_class.create_double_precision_real_field_class()
+        )
+    sc.create_event_class(name="trkpt", payload_field_class=trkpt_payload)
+
+    return trace_class
 
 
 class GpxIter(bt2._UserMessageIterator):
     def __init__(self, config, port):
         print("GpxIter: Creating for port {}".format(port))
-        self._trk_elem, self._trace_class = port.user_data
+        self._trkpts, self._trace_class = port.user_data
 
         self._trace = self._trace_class()
 
@@ -18,13 +846,23 @@ class GpxIter(bt2._UserMessageIterator):
         self._trkpt_event_class = self._trk_stream_class[0]
         assert self._trkpt_event_class.name == "trkpt"
 
+        self._trkpt_iter = None
+        self._restart(None)
+
+    def _restart(self, begin):
+        """
+        (Re)starts the iteration from the first point at or after `begin`
+        (in ns from the clock origin, the Unix epoch), or from the beginning
+        if None.
+        """
+        if self._trkpt_iter is not None:
+            self._trkpt_iter.close()
+
         self._init_msgs = [self._create_stream_beginning_message(self._trk_stream)]
 
         self._end_msgs = [self._create_stream_end_message(self._trk_stream)]
 
-        self._trkpt_iter = self._trk_elem.iter(
-            "{http://www.topografix.com/GPX/1/1}trkpt"
-        )
+        self._trkpt_iter = self._trkpts(begin=begin)
 
         self._next = self._next_init
 
@@ -37,16 +875,7 @@ class GpxIter(bt2._UserMessageIterator):
 
     def _next_events(self):
         try:
-            trkpt = next(self._trkpt_iter)
-
-            lat = float(trkpt.attrib["lat"])
-            lon = float(trkpt.attrib["lon"])
-            ele_elem = trkpt.find("{http://www.topografix.com/GPX/1/1}ele")
-            ele = float(ele_elem.text)
-
-            time_elem = trkpt.find("{http://www.topografix.com/GPX/1/1}time")
-            time = datetime.strptime(time_elem.text, "%Y-%m-%dT%H:%M:%SZ")
-            ts = int(datetime.timestamp(time))
+            (lat, lon, ele, ts) = next(self._trkpt_iter)
 
             event_msg = self._create_event_message(
                 self._trkpt_event_class, self._trk_stream, default_clock_snapshot=ts
@@ -68,6 +897,18 @@ class GpxIter(bt2._UserMessageIterator):
     def __next__(self):
         return self._next()
 
+    def _user_can_seek_beginning(self):
+        return True
+
+    def _user_seek_beginning(self):
+        self._restart(None)
+
+    def _user_can_seek_ns_from_origin(self, ns_from_origin):
+        return True
+
+    def _user_seek_ns_from_origin(self, ns_from_origin):
+        self._restart(ns_from_origin)
+
 
 @bt2.plugin_component_class
 class GpxSource(bt2._UserSourceComponent, message_iterator_class=GpxIter):
@@ -86,44 +927,147 @@ class GpxSource(bt2._UserSourceComponent, message_iterator_class=GpxIter):
                 )
             )
 
-        if len(inputs) != 1:
-            raise ValueError(
-                "GpxSource: expecting `inputs` parameter to be of length, got {}".format(
-                    len(inputs)
-                )
-            )
+        if len(inputs) == 0:
+            raise ValueError("GpxSource: expecting `inputs` to not be of length zero")
 
-        if type(inputs[0]) != bt2._StringValueConst:
-            raise TypeError(
-                "GpxSource: expecting `inputs[0]` parameter to be a string, got a {}".format(
-                    type(inputs[0])
+        for (i, input) in enumerate(inputs):
+            if type(input) != bt2._StringValueConst:
+                raise TypeError(
+                    "GpxSource: expecting `inputs[{}]` parameter to be a string, got a {}".format(
+                        i, type(input)
+                    )
                 )
-            )
+
+        # Number of processes parsing the tracks, 0 to parse them in the
+        # message iterators.
+        jobs = int(params["jobs"]) if "jobs" in params else 0
+
+        # Whether to read tracks from, and write them to, columnar caches.
+        use_cache = bool(params["cache"]) if "cache" in params else False
+
+        selection = self._get_selection(params)
+
+        inputs = [str(input) for input in inputs]
+        for input in inputs:
+            if not os.path.isfile(input):
+                raise ValueError("GpxSource: {} is not a file".format(input))
+
+        # A file given more than once would have the same tracks, on ports of
+        # the same name.
+        unique_inputs = []
+        real_paths = set()
+        for input in inputs:
+            real_path = os.path.realpath(input)
+            if real_path not in real_paths:
+                real_paths.add(real_path)
+                unique_inputs.append(input)
+        inputs = unique_inputs
+
+        caches = {}
+        if use_cache:
+            caches = {input: _GpxCache.open(input) for input in inputs}
+
+            stale = [input for input in inputs if caches[input] is None]
+            for (input, error) in _build_caches(stale, jobs):
+                print("GpxSource: Couldn't write cache of {}:".format(input), error)
+
+            for input in stale:
+                caches[input] = _GpxCache.open(input)
 
         trace_class = self._create_metadata()
 
-        self._create_ports_for_file(str(inputs[0]), trace_class)
+        # (port name, callable returning the points from an optional `begin`
+        # time) of each track. Tracks parsed from XML are described by the arguments of
+        # `_iter_trkpts` until the parsing pool, if any, is created.
+        ports = []
+        tasks = []
+        for input in inputs:
+            cache = caches.get(input)
+            if cache is not None:
+                for i in range(len(cache)):
+                    # Tracks entirely outside of the selection have no port.
+                    if selection is not None and not cache.overlaps(i, selection):
+                        continue
 
-    def _create_metadata(self):
-        clock_class = self._create_clock_class(frequency=1)
-        trace_class = self._create_trace_class()
+                    trkpts = functools.partial(
+                        cache.iter_trkpts, i, selection=selection
+                    )
+                    ports.append(("{}:{}".format(input, i), trkpts))
+            else:
+                for (task, name) in self._scan_file(input):
+                    ports.append((name, len(tasks)))
+                    tasks.append(task)
 
-        sc = trace_class.create_stream_class(
-            name="trk", default_clock_class=clock_class
-        )
+        if jobs > 0 and tasks:
+            self._pool = _ParsePool(tasks, jobs, selection)
+        else:
+            self._pool = None
 
-        # 'trkpt' event
-        trkpt_payload = trace_class.create_structure_field_class()
-        trkpt_payload.append_member(
-            "lat", trace_class.create_double_precision_real_field_class()
-        )
-        trkpt_payload.append_member(
-            "lon", trace_class.create_double_precision_real_field_class()
-        )
-        trkpt_payload.append_member(
-            "ele", trace_class.create_double_precision_real_field_class()
-        )
-        sc.create_event_class(name="trkpt", payload_field_class=trkpt_payload)
+        for (name, trkpts) in ports:
+            if type(trkpts) is int:
+                if self._pool is None:
+                    trkpts = functools.partial(
+                        _iter_trkpts, *tasks[trkpts], selection=selection
+                    )
+                else:
+                    trkpts = functools.partial(self._pool.iter_trkpts, trkpts)
+
+            print("GpxSource: Adding output port", name)
+            self._add_output_port(name, (trkpts, trace_class))
+
+    def _user_finalize(self):
+        if self._pool is not None:
+            self._pool.close()
+
+    @staticmethod
+    def _get_selection(params):
+        """
+        Returns the _Selection described by the `bbox` and `time-range`
+        parameters, or None if neither is given.
+        """
+        bbox = None
+        if "bbox" in params:
+            bbox = params["bbox"]
+            if type(bbox) != bt2._ArrayValueConst or len(bbox) != 4:
+                raise TypeError(
+                    "GpxSource: expecting `bbox` parameter to be a list of 4 numbers"
+                )
+
+            bbox = tuple(float(value) for value in bbox)
+            if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise ValueError(
+                    "GpxSource: expecting `bbox` to be [min lat, min lon, max lat, max lon]"
+                )
+
+        begin = None
+        end = None
+        if "time-range" in params:
+            time_range = params["time-range"]
+            if type(time_range) != bt2._ArrayValueConst or len(time_range) != 2:
+                raise TypeError(
+                    "GpxSource: expecting `time-range` parameter to be a list of 2 times"
+                )
+
+            # Each bound is null (open), ns since the Unix epoch or an ISO 8601
+            # string.
+            bounds = []
+            for bound in time_range:
+                if bound is None:
+                    bounds.append(None)
+                elif type(bound) == bt2._StringValueConst:
+                    bounds.append(_TimeParser().parse(str(bound)))
+                else:
+                    bounds.append(int(bound))
+
+            (begin, end) = bounds
+
+        if bbox is None and begin is None and end is None:
+            return None
+
+        return _Selection(bbox, begin, end)
+
+    def _create_metadata(self):
+        trace_class = _create_trk_trace_class(self, ("lat", "lon", "ele"))
 
         print("GpxSource: Created trace class", trace_class)
         print("GpxSource:     with stream class trk", trace_class[0])
@@ -131,16 +1075,17 @@ class GpxSource(bt2._UserSourceComponent, message_iterator_class=GpxIter):
 
         return trace_class
 
-    def _create_ports_for_file(self, input, trace_class):
-        if not os.path.isfile(input):
-            raise ValueError("GpxSource: {} is not a file".format(input))
-
-        tree = etree.parse(input)
-        assert tree.getroot().tag == "{http://www.topografix.com/GPX/1/1}gpx"
+    @staticmethod
+    def _scan_file(input):
+        """
+        Returns a list of (task, port name), one per track of the file.
+        """
+        (prolog, extents) = _scan_tracks(input)
 
-        for trk in tree.findall("{http://www.topografix.com/GPX/1/1}trk"):
-            print("GpxSource: Adding output port for track", trk)
-            self._add_output_port("out", (trk, trace_class))
+        return [
+            ((input, prolog, start, end), "{}:{}".format(input, i))
+            for (i, (start, end)) in enumerate(extents)
+        ]
 
     @staticmethod
     def _user_query(query_executor, obj, params, log_level):
@@ -155,6 +1100,250 @@ class GpxSource(bt2._UserSourceComponent, message_iterator_class=GpxIter):
             raise bt2.UnknownObject
 
 
+# Mean Earth radius, in m.
+_EARTH_RADIUS = 6371008.8
+
+_METRICS_MEMBERS = ("lat", "lon", "ele", "distance", "speed", "grade", "ascent")
+
+
+class _TrackMetrics(object):
+    """
+    Derived metrics of a track, computed a block of points at a time.
+
+    The last point and the running totals are kept between blocks, so the
+    metrics don't depend on where blocks are split.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._last = None
+        self._distance = 0.0
+        self._ascent = 0.0
+
+    def compute(self, lat, lon, ele, ts):
+        """
+        Returns (distance, speed, grade, ascent) arrays for the points of a
+        block, given as lists of their lat, lon, ele (in degrees and m) and ts
+        (in ns).
+        """
+        import numpy as np
+
+        lat = np.radians(np.array(lat, dtype=np.float64))
+        lon = np.radians(np.array(lon, dtype=np.float64))
+        ele = np.array(ele, dtype=np.float64)
+        ts = np.array(ts, dtype=np.int64)
+
+        # The previous point of the first one is itself, for the first block.
+        last = self._last
+        if last is None:
+            last = (lat[0], lon[0], ele[0], ts[0])
+
+        prev_lat = np.concatenate(([last[0]], lat[:-1]))
+        prev_lon = np.concatenate(([last[1]], lon[:-1]))
+        prev_ele = np.concatenate(([last[2]], ele[:-1]))
+        prev_ts = np.concatenate(([last[3]], ts[:-1]))
+
+        # Haversine distance from the previous point.
+        a = (
+            np.sin((lat - prev_lat) / 2) ** 2
+            + np.cos(prev_lat) * np.cos(lat) * np.sin((lon - prev_lon) / 2) ** 2
+        )
+        step = 2 * _EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        climb = ele - prev_ele
+        seconds = (ts - prev_ts) / 1e9
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = np.where(seconds > 0, step / seconds, np.nan)
+            grade = np.where(step > 0, climb / step, np.nan)
+
+        distance = self._distance + np.cumsum(step)
+        ascent = self._ascent + np.cumsum(np.where(climb > 0, climb, 0.0))
+
+        self._last = (lat[-1], lon[-1], ele[-1], ts[-1])
+        self._distance = float(distance[-1])
+        self._ascent = float(ascent[-1])
+
+        return (distance, speed, grade, ascent)
+
+
+class GpxMetricsIter(bt2._UserMessageIterator):
+    def __init__(self, config, port):
+        input_port, self._trace_class, self._block_size = port.user_data
+
+        self._upstream = self._create_message_iterator(input_port)
+        self._upstream_ended = False
+
+        self._trk_stream_class = self._trace_class[0]
+        self._trkpt_event_class = self._trk_stream_class[0]
+
+        # Our trace of each upstream trace, and _TrackMetrics of each upstream
+        # trkpt stream, by address.
+        self._traces = {}
+        self._tracks = {}
+
+        # Upstream messages of the current block, and how many of them are
+        # trkpt events.
+        self._block = []
+        self._block_trkpts = 0
+
+        self._msgs = collections.deque()
+
+    def __next__(self):
+        if not self._msgs:
+            self._read_block()
+            self._process_block()
+
+        return self._msgs.popleft()
+
+    def _read_block(self):
+        """
+        Reads upstream messages until the block holds `block-size` trkpt
+        events, upstream has nothing available right now, or it ended.
+        """
+        if self._upstream_ended:
+            raise bt2.Stop
+
+        try:
+            while self._block_trkpts < self._block_size:
+                msg = next(self._upstream)
+                self._block.append(msg)
+
+                if (
+                    type(msg) is bt2._EventMessageConst
+                    and msg.event.stream.addr in self._tracks
+                ):
+                    self._block_trkpts += 1
+                elif type(msg) is bt2._StreamBeginningMessageConst:
+                    self._map_stream(msg.stream)
+        except bt2.TryAgain:
+            if not self._block:
+                raise
+        except StopIteration:
+            self._upstream_ended = True
+            if not self._block:
+                raise bt2.Stop
+
+    def _map_stream(self, stream):
+        """
+        Maps `stream` to one of our streams if it is a stream of GPX track
+        points: its only event class is `trkpt` with lat, lon and ele, and it
+        has neither packets nor discarded items.
+        """
+        sc = stream.cls
+        if (
+            len(sc) != 1
+            or sc.supports_packets
+            or sc.supports_discarded_events
+            or sc.default_clock_class is None
+        ):
+            return
+
+        event_class = next(iter(sc.values()))
+        payload = event_class.payload_field_class
+        if (
+            event_class.name != "trkpt"
+            or payload is None
+            or not all(name in payload for name in ("lat", "lon", "ele"))
+        ):
+            return
+
+        trace = self._traces.get(stream.trace.addr)
+        if trace is None:
+            trace = self._trace_class()
+            self._traces[stream.trace.addr] = trace
+
+        self._tracks[stream.addr] = _TrackMetrics(
+            trace.create_stream(self._trk_stream_class)
+        )
+
+    def _process_block(self):
+        # Gather the points of each track, compute their metrics a track at a
+        # time, then create the messages in the upstream order.
+        points = collections.defaultdict(lambda: ([], [], [], []))
+        for msg in self._block:
+            if type(msg) is not bt2._EventMessageConst:
+                continue
+
+            track = self._tracks.get(msg.event.stream.addr)
+            if track is None:
+                continue
+
+            payload = msg.event.payload_field
+            (lat, lon, ele, ts) = points[track]
+            lat.append(float(payload["lat"]))
+            lon.append(float(payload["lon"]))
+            ele.append(float(payload["ele"]))
+            ts.append(msg.default_clock_snapshot.ns_from_origin)
+
+        # (ts, lat, lon, ele, distance, speed, grade, ascent) of the points of
+        # each track.
+        rows = {}
+        for (track, (lat, lon, ele, ts)) in points.items():
+            metrics = track.compute(lat, lon, ele, ts)
+            rows[track] = zip(ts, lat, lon, ele, *(m.tolist() for m in metrics))
+
+        for msg in self._block:
+            self._msgs.append(self._map_message(msg, rows))
+
+        self._block = []
+        self._block_trkpts = 0
+
+    def _map_message(self, msg, rows):
+        msg_type = type(msg)
+
+        if msg_type is bt2._EventMessageConst:
+            track = self._tracks.get(msg.event.stream.addr)
+            if track is None:
+                return msg
+
+            (ts, *values) = next(rows[track])
+            event_msg = self._create_event_message(
+                self._trkpt_event_class, track.stream, default_clock_snapshot=ts
+            )
+            payload = event_msg.event.payload_field
+            for (member, value) in zip(_METRICS_MEMBERS, values):
+                payload[member] = value
+            return event_msg
+
+        if msg_type is bt2._StreamBeginningMessageConst:
+            track = self._tracks.get(msg.stream.addr)
+            if track is not None:
+                return self._create_stream_beginning_message(track.stream)
+        elif msg_type is bt2._StreamEndMessageConst:
+            track = self._tracks.pop(msg.stream.addr, None)
+            if track is not None:
+                return self._create_stream_end_message(track.stream)
+
+        return msg
+
+
+@bt2.plugin_component_class
+class GpxMetrics(bt2._UserFilterComponent, message_iterator_class=GpxMetricsIter):
+    """
+    Adds metrics derived from the position of the points to the `trkpt`
+    events of GPX tracks: distance (cumulative, in m), speed (in m/s), grade
+    (elevation gain over distance) and ascent (cumulative elevation gain, in
+    m).
+
+    Metrics are computed with numpy, a block of points at a time. Other
+    messages are forwarded unchanged.
+    """
+
+    def __init__(self, config, params, obj):
+        print("GpxMetrics: Creating with params {}".format(params))
+
+        # Number of trkpt events buffered before computing their metrics.
+        block_size = int(params["block-size"]) if "block-size" in params else 4096
+        if block_size <= 0:
+            raise ValueError("GpxMetrics: expecting `block-size` to be positive")
+
+        trace_class = _create_trk_trace_class(self, _METRICS_MEMBERS)
+
+        input_port = self._add_input_port("in")
+        self._add_output_port("out", (input_port, trace_class, block_size))
+
+
 bt2.register_plugin(
     module_name=__name__,
     name="gpx",
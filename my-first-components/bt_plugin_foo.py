@@ -1,4 +1,5 @@
 import bt2
+import random
 
 bt2.register_plugin(__name__, "demo")
 
@@ -61,3 +62,146 @@ class MyFirstSink(bt2._UserSinkComponent):
             print("Stream end")
         else:
             raise RuntimeError("Unhandled message type", type(msg))
+
+
+class LoadSourceIter(bt2._UserMessageIterator):
+    def __init__(self, config, output_port):
+        (sc, event_classes, field_types, count, period, seed) = output_port.user_data
+
+        trace = sc.trace_class()
+        self._stream = trace.create_stream(sc)
+        self._event_classes = event_classes
+        self._field_types = field_types
+        self._count = count
+        self._period = period
+        self._rng = random.Random(seed)
+
+        # Contrary to MyFirstSourceIter, messages are created one at a time,
+        # so memory use doesn't depend on the number of generated events.
+        self._msgs = self._generate()
+
+    def _generate(self):
+        yield self._create_stream_beginning_message(self._stream)
+
+        rng = self._rng
+        value_makers = {
+            "int": lambda: rng.getrandbits(63) - (1 << 62),
+            "uint": lambda: rng.getrandbits(64),
+            "real": rng.random,
+            "bool": lambda: rng.getrandbits(1) == 1,
+            "string": lambda: "{:016x}".format(rng.getrandbits(64)),
+        }
+        makers = [(name, value_makers[t]) for (name, t) in self._field_types]
+
+        for i in range(self._count):
+            ec = self._event_classes[rng.randrange(len(self._event_classes))]
+            msg = self._create_event_message(
+                ec, self._stream, default_clock_snapshot=int(i * self._period)
+            )
+
+            payload = msg.event.payload_field
+            for (name, maker) in makers:
+                payload[name] = maker()
+
+            yield msg
+
+        yield self._create_stream_end_message(self._stream)
+
+    def __next__(self):
+        return next(self._msgs)
+
+
+@bt2.plugin_component_class
+class LoadSource(bt2._UserSourceComponent, message_iterator_class=LoadSourceIter):
+    """
+    Synthetic load generator, to benchmark sinks without any decoder upstream.
+
+    Parameters (all optional):
+
+      count:         number of events per stream (default: 1000)
+      rate:          events per second of trace time (default: 1000)
+      event-classes: number of event classes (default: 1)
+      fields:        number of payload fields (default: 1)
+      field-types:   array of field types, cycled over the fields, among
+                     "int", "uint", "real", "bool" and "string"
+                     (default: ["real"])
+      streams:       number of streams, one output port each (default: 1)
+      seed:          random seed (default: 0)
+    """
+
+    def __init__(self, config, params, obj):
+        count = LoadSource._get_param(params, "count", 1000)
+        rate = LoadSource._get_param(params, "rate", 1000)
+        nb_event_classes = LoadSource._get_param(params, "event-classes", 1)
+        nb_fields = LoadSource._get_param(params, "fields", 1)
+        nb_streams = LoadSource._get_param(params, "streams", 1)
+        seed = LoadSource._get_param(params, "seed", 0)
+
+        if "field-types" in params:
+            types = [str(t) for t in params["field-types"]]
+        else:
+            types = ["real"]
+
+        for t in types:
+            if t not in ("int", "uint", "real", "bool", "string"):
+                raise ValueError("LoadSource: unknown field type `{}`".format(t))
+
+        if rate <= 0 or nb_event_classes <= 0 or nb_streams <= 0 or not types:
+            raise ValueError("LoadSource: invalid parameters {}".format(params))
+
+        tc = self._create_trace_class()
+        cc = self._create_clock_class(frequency=1000000000)
+        sc = tc.create_stream_class(default_clock_class=cc)
+
+        field_types = [
+            ("f{}".format(i), types[i % len(types)]) for i in range(nb_fields)
+        ]
+
+        event_classes = []
+        for i in range(nb_event_classes):
+            payload = tc.create_structure_field_class()
+            for (name, t) in field_types:
+                payload.append_member(name, LoadSource._create_field_class(tc, t))
+            event_classes.append(
+                sc.create_event_class(
+                    name="load-event-{}".format(i), payload_field_class=payload
+                )
+            )
+
+        period = 1000000000 / rate
+        for i in range(nb_streams):
+            self._add_output_port(
+                "out-{}".format(i),
+                (sc, event_classes, field_types, count, period, seed + i),
+            )
+
+    @staticmethod
+    def _get_param(params, key, default):
+        if key not in params:
+            return default
+
+        param = params[key]
+        if type(param) not in (
+            bt2._SignedIntegerValueConst,
+            bt2._UnsignedIntegerValueConst,
+        ):
+            raise TypeError(
+                "LoadSource: expecting `{}` parameter to be an integer, got a {}".format(
+                    key, type(param)
+                )
+            )
+
+        return int(param)
+
+    @staticmethod
+    def _create_field_class(tc, t):
+        if t == "int":
+            return tc.create_signed_integer_field_class(64)
+        elif t == "uint":
+            return tc.create_unsigned_integer_field_class(64)
+        elif t == "real":
+            return tc.create_double_precision_real_field_class()
+        elif t == "bool":
+            return tc.create_bool_field_class()
+        else:
+            return tc.create_string_field_class()
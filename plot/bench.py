@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# *_* coding: utf-8 *_*
+
+"""
+Startup-time benchmark for the discovery of the plot plugin.
+
+Measures, in fresh processes so that nothing is cached between runs:
+
+ * `babeltrace2 --plugin-path DIR list-plugins`,
+ * `bt2.find_plugins_in_path(DIR)` from Python.
+
+Neither should import matplotlib or numpy; the script reports it if they are.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+FIND_PLUGINS = """
+import bt2, sys
+bt2.find_plugins_in_path(sys.argv[1])
+heavy = [m for m in ("matplotlib", "numpy") if m in sys.modules]
+if heavy:
+    print("imported during discovery: " + ", ".join(heavy), file=sys.stderr)
+    sys.exit(1)
+"""
+
+
+def time_command(cmd, repeat):
+    """
+    Runs `cmd` `repeat` times, returns the list of wall times in s.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--babeltrace", default=os.environ.get("BABELTRACE2", "babeltrace2"))
+    parser.add_argument("--plugin-path", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    commands = {
+        "babeltrace2 list-plugins": [args.babeltrace, "--plugin-path", args.plugin_path, "list-plugins"],
+        "bt2.find_plugins_in_path": [sys.executable, "-c", FIND_PLUGINS, args.plugin_path],
+    }
+
+    print(f"{'command':30} {'median (s)':>11} {'min (s)':>9}")
+    for (name, cmd) in commands.items():
+        times = time_command(cmd, args.repeat)
+        print(f"{name:30} {statistics.median(times):11.3f} {min(times):9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,92 @@
 import bt2
-import bintrees
+from array import array
 import itertools
-import matplotlib.pyplot as plt
+import multiprocessing
+import os
+import sys
+import tempfile
+import traceback
+
+# matplotlib and numpy are only imported when data is actually plotted or
+# interpolated: importing them (and setting up matplotlib's font cache) would
+# otherwise slow down every plugin discovery, e.g. `babeltrace2 list-plugins`.
+
+
+def _import_pyplot():
+    import matplotlib
+
+    # Plots are only ever saved to files.
+    matplotlib.use("Agg")
+
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+class SeriesBuffer(object):
+    """
+        Growable typed series (see `array` for type codes).
+
+        When `spill_threshold` is set, points are moved to an anonymous
+        temporary file every time that many points are buffered, and the
+        series is handed back as a read-only memory map, so memory use doesn't
+        depend on the length of the series.
+    """
+
+    def __init__(self, typecode, spill_threshold=None):
+        self._data = array(typecode)
+        self._spill_threshold = spill_threshold
+        self._file = None
+        self._spilled = 0
+
+        # Without threshold, appending is as cheap as with a bare array.
+        if spill_threshold is None:
+            self.append = self._data.append
+
+    def __len__(self):
+        return self._spilled + len(self._data)
+
+    def append(self, value):
+        self._data.append(value)
+        if len(self._data) >= self._spill_threshold:
+            self._spill()
+
+    def get(self):
+        """
+            Returns the series as an object supporting the buffer protocol,
+            without copying it.
+        """
+        if self._file is None:
+            return self._data
+
+        import numpy as np
+
+        self._spill()
+        self._file.flush()
+        return np.memmap(
+            self._file, dtype=self._data.typecode, mode="r", shape=(self._spilled,)
+        )
+
+    def _spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+
+        self._data.tofile(self._file)
+        self._spilled += len(self._data)
+        del self._data[:]
 
 
 class DataLogger(object):
-    def __init__(self, name="Untitled"):
+    # Whether received points must be in timestamp order across all inputs.
+    NEEDS_ORDERING = False
+
+    def __init__(
+        self, name="Untitled", spill_threshold=None, min_interval=None, every=None
+    ):
         self._name = name
+        self._spill_threshold = spill_threshold
+        self._min_interval = min_interval
+        self._every = every
 
     def get_name(self):
         return self._name
@@ -17,9 +97,44 @@ class DataLogger(object):
     def get_y_data(self):
         raise NotImplementedError
 
-    def received_event(self, ts, event):
+    def get_subscriptions(self):
+        """
+            Returns a list of (event name, field name, callback) tuples, where
+            callback(ts, value) must be called for each value of that field.
+        """
         raise NotImplementedError
 
+    def _create_series(self, typecode):
+        return SeriesBuffer(typecode, self._spill_threshold)
+
+    def _decimated(self, callback):
+        """
+            Returns `callback`, wrapped so that it only receives every Nth
+            point (`every`) and no two points closer than `min_interval`.
+        """
+        if self._min_interval is None and self._every is None:
+            return callback
+
+        min_interval = self._min_interval or 0
+        every = self._every or 1
+        count = 0
+        last = None
+
+        def decimated(ts, value):
+            nonlocal count, last
+
+            count += 1
+            if (count - 1) % every != 0:
+                return
+
+            if last is not None and ts - last < min_interval:
+                return
+
+            last = ts
+            callback(ts, value)
+
+        return decimated
+
 
 class TimedDataLogger(DataLogger):
     """
@@ -32,23 +147,38 @@ class TimedDataLogger(DataLogger):
 
         (self._event, self._field) = data
 
-        self._timestamps = []
-        self._values = []
+        # Typed arrays take 8 bytes per point (instead of a boxed Python
+        # object + a list slot) and expose the buffer protocol, so matplotlib
+        # wraps them in numpy arrays without copying.
+        self._timestamps = self._create_series("q")
+        self._values = self._create_series("d")
+
+        self._add = self._decimated(self._add_data_point)
 
     def get_x_data(self):
-        return self._timestamps
+        return self._get_ordered(self._timestamps)
 
     def get_y_data(self):
-        return self._values
+        return self._get_ordered(self._values)
+
+    def _get_ordered(self, series):
+        # Points from several unsynchronized inputs may be received out of
+        # order, in which case they are sorted once here rather than ordering
+        # all messages while they are received.
+        import numpy as np
 
-    def received_event(self, ts, event):
-        if event.name == self._event and self._field in event.payload_field:
-            value = event.payload_field[self._field]
-            self._add_data_point(ts, value)
+        timestamps = np.asarray(self._timestamps.get())
+        if np.all(timestamps[1:] >= timestamps[:-1]):
+            return series.get()
+
+        return np.asarray(series.get())[np.argsort(timestamps, kind="stable")]
+
+    def get_subscriptions(self):
+        return [(self._event, self._field, self._add)]
 
     def _add_data_point(self, ts, value):
         self._timestamps.append(ts)
-        self._values.append(value)
+        self._values.append(float(value))
 
 
 class InterpolatedDataLogger(DataLogger):
@@ -66,119 +196,250 @@ class InterpolatedDataLogger(DataLogger):
         then we also must have:
 
             tX_0 < tX_1 < ... < tX_N.
+
+        Points outside of the range of a set of data take the value of its
+        nearest point.
     """
 
+    NEEDS_ORDERING = True
+
     def __init__(self, data1, data2, *args, **kwargs):
         super(InterpolatedDataLogger, self).__init__(*args, **kwargs)
 
         (self._event1, self._field1) = data1
         (self._event2, self._field2) = data2
 
-        self._x_timestamps = []
-        self._x_values = []
-        self._x_needs_interpolation = dict()
-        self._x_received_values = bintrees.AVLTree()
+        # Timestamps of all received points, in order: each of them is a
+        # point of the resulting curve.
+        self._timestamps = self._create_series("q")
+
+        # Received points of each set of data, sorted since data is received
+        # in order. Both sets are interpolated at all timestamps in a single
+        # pass when the data is requested.
+        self._x_timestamps = self._create_series("q")
+        self._x_received_values = self._create_series("d")
+
+        self._y_timestamps = self._create_series("q")
+        self._y_received_values = self._create_series("d")
+
+        self._x_values = None
+        self._y_values = None
 
-        self._y_timestamps = []
-        self._y_values = []
-        self._y_needs_interpolation = dict()
-        self._y_received_values = bintrees.AVLTree()
+        self._add_x = self._decimated(self._add_x_data_point)
+        self._add_y = self._decimated(self._add_y_data_point)
 
     def get_x_data(self):
-        self._interpolate_x_data()
+        if self._x_values is None:
+            self._x_values = self._interpolate(
+                self._x_timestamps, self._x_received_values
+            )
         return self._x_values
 
     def get_y_data(self):
-        self._interpolate_y_data()
+        if self._y_values is None:
+            self._y_values = self._interpolate(
+                self._y_timestamps, self._y_received_values
+            )
         return self._y_values
 
-    def received_event(self, ts, event):
-        if event.name == self._event1 and self._field1 in event.payload_field:
-            value = event.payload_field[self._field1]
-            self._add_x_data_point(ts, value)
+    def get_subscriptions(self):
+        return [
+            (self._event1, self._field1, self._add_x),
+            (self._event2, self._field2, self._add_y),
+        ]
+
+    # Number of points interpolated at once, which bounds the size of the
+    # temporary arrays.
+    INTERPOLATION_CHUNK = 1 << 20
+
+    def _interpolate(self, received_timestamps, received_values):
+        import numpy as np
+
+        timestamps = np.asarray(self._timestamps.get())
+        received_timestamps = np.asarray(received_timestamps.get())
+        received_values = np.asarray(received_values.get())
+
+        n = len(timestamps)
+        if len(received_timestamps) == 0:
+            return np.full(n, np.nan)
+
+        # Points received at the same timestamp: the last one wins.
+        last = np.append(received_timestamps[1:] != received_timestamps[:-1], True)
+        if not last.all():
+            received_timestamps = received_timestamps[last]
+            received_values = received_values[last]
+
+        if self._spill_threshold is not None and n > self._spill_threshold:
+            values = np.memmap(
+                tempfile.TemporaryFile(), dtype=np.float64, mode="w+", shape=(n,)
+            )
+        else:
+            values = np.empty(n)
+
+        # Timestamps are made relative to the first one before being
+        # converted to floats, so nanosecond precision isn't lost.
+        origin = timestamps[0]
+
+        for start in range(0, n, InterpolatedDataLogger.INTERPOLATION_CHUNK):
+            end = start + InterpolatedDataLogger.INTERPOLATION_CHUNK
+            chunk = timestamps[start:end]
+
+            # Only the received points surrounding the chunk are needed, all
+            # others are either before or after it.
+            lo = max(np.searchsorted(received_timestamps, chunk[0], "right") - 1, 0)
+            hi = max(np.searchsorted(received_timestamps, chunk[-1], "left") + 1, lo + 1)
+
+            values[start:end] = np.interp(
+                (chunk - origin).astype(np.float64),
+                (received_timestamps[lo:hi] - origin).astype(np.float64),
+                received_values[lo:hi],
+            )
+
+        return values
 
-        if event.name == self._event2 and self._field2 in event.payload_field:
-            value = event.payload_field[self._field2]
-            self._add_y_data_point(ts, value)
+    def _add_x_data_point(self, ts, value):
+        self._timestamps.append(ts)
+        self._x_timestamps.append(ts)
+        self._x_received_values.append(float(value))
+        self._x_values = None
 
-    def _interpolate(self, ts, received_values):
-        try:
-            (after_ts, after_value) = received_values.ceiling_item(ts)
-        except KeyError:
-            (before_ts, before_value) = received_values.floor_item(ts)
-            return before_value
+    def _add_y_data_point(self, ts, value):
+        self._timestamps.append(ts)
+        self._y_timestamps.append(ts)
+        self._y_received_values.append(float(value))
+        self._y_values = None
 
-        try:
-            (before_ts, before_value) = received_values.floor_item(ts)
-        except KeyError:
-            return after_value
 
-        if before_ts == after_ts:
-            return before_value
+def downsample_minmax(x, y, max_points):
+    """
+        Splits the points in buckets of consecutive points and keeps the
+        minimum and the maximum of each bucket, in their original order, so
+        peaks are preserved.
+    """
+    import numpy as np
 
-        a = ts - before_ts
-        x = (after_value - before_value) / (after_ts - before_ts)
-        b = before_value
+    n = len(y)
+    nb_buckets = max(max_points // 2, 1)
+    size = -(-n // nb_buckets)
+    full = n // size
 
-        return a * x + b
+    y_full = y[: full * size].reshape(full, size)
+    offsets = np.arange(full) * size
+    indices = [
+        offsets + np.argmin(y_full, axis=1),
+        offsets + np.argmax(y_full, axis=1),
+    ]
 
-    def _interpolate_x(self, ts):
-        return self._interpolate(ts, self._x_received_values)
+    if full * size < n:
+        rest = y[full * size :]
+        indices.append([full * size + np.argmin(rest), full * size + np.argmax(rest)])
 
-    def _interpolate_y(self, ts):
-        return self._interpolate(ts, self._y_received_values)
+    indices = np.unique(np.concatenate(indices))
+    return (x[indices], y[indices])
 
-    def _interpolate_x_data(self):
-        for (index, interpolated_ts) in self._x_needs_interpolation.items():
-            interpolated_value = self._interpolate_x(interpolated_ts)
-            self._x_timestamps[index] = interpolated_ts
-            self._x_values[index] = interpolated_value
-        self._x_needs_interpolation.clear()
 
-    def _interpolate_y_data(self):
-        for (index, interpolated_ts) in self._y_needs_interpolation.items():
-            interpolated_value = self._interpolate_y(interpolated_ts)
-            self._y_timestamps[index] = interpolated_ts
-            self._y_values[index] = interpolated_value
-        self._y_needs_interpolation.clear()
+def downsample_lttb(x, y, max_points):
+    """
+        Largest-Triangle-Three-Buckets: keeps the first and last points and,
+        for each bucket in between, the point forming the largest triangle
+        with the previously kept point and the average of the next bucket.
+    """
+    import numpy as np
 
-    def _add_x_data_point(self, ts, value):
-        self._x_timestamps.append(ts)
-        self._x_values.append(value)
-        self._x_received_values[ts] = value
+    n = len(y)
+    if max_points < 3:
+        return (x[[0, n - 1]], y[[0, n - 1]])
 
-        self._interpolate_x_data()
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
 
-        self._y_timestamps.append(None)
-        self._y_values.append(None)
-        self._y_needs_interpolation[len(self._y_timestamps) - 1] = ts
+    a = 0
+    for i in range(max_points - 2):
+        (start, end) = (edges[i], max(edges[i + 1], edges[i] + 1))
+        if i + 2 < len(edges):
+            (next_start, next_end) = (end, max(edges[i + 2], end + 1))
+        else:
+            (next_start, next_end) = (n - 1, n)
 
-    def _add_y_data_point(self, ts, value):
-        self._y_timestamps.append(ts)
-        self._y_values.append(value)
-        self._y_received_values[ts] = value
+        # Only the current and next buckets are converted, so series which
+        # are memory mapped are read in a streaming fashion.
+        avg_x = x[next_start:next_end].astype(np.float64).mean()
+        avg_y = y[next_start:next_end].astype(np.float64).mean()
+
+        (ax, ay) = (float(x[a]), float(y[a]))
+        bucket_x = x[start:end].astype(np.float64)
+        bucket_y = y[start:end].astype(np.float64)
 
-        self._interpolate_y_data()
+        areas = np.abs((ax - avg_x) * (bucket_y - ay) - (ax - bucket_x) * (avg_y - ay))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
 
-        self._x_timestamps.append(None)
-        self._x_values.append(None)
-        self._x_needs_interpolation[len(self._y_timestamps) - 1] = ts
+    return (x[indices], y[indices])
 
 
 class Plot(object):
+    DOWNSAMPLERS = {"minmax": downsample_minmax, "lttb": downsample_lttb}
+    FORMATS = ("pdf", "npz", "npy")
+
     def __init__(
-        self, loggers, title="Untitled", x_label="Untitled", y_label="Untitled"
+        self,
+        loggers,
+        title="Untitled",
+        x_label="Untitled",
+        y_label="Untitled",
+        downsampling="minmax",
+        max_points=None,
+        formats=("pdf",),
+        begin=None,
+        end=None,
     ):
         self._loggers = loggers
         self._title = title
         self._x_label = x_label
         self._y_label = y_label
 
-    def received_event(self, ts, event):
-        for logger in self._loggers:
-            logger.received_event(ts, event)
+        if downsampling not in Plot.DOWNSAMPLERS:
+            raise ValueError(f"unknown downsampling method `{downsampling}`")
+
+        self._downsample = Plot.DOWNSAMPLERS[downsampling]
+        self._max_points = max_points
+
+        for fmt in formats:
+            if fmt not in Plot.FORMATS:
+                raise ValueError(f"unknown format `{fmt}`")
+
+        self._formats = formats
+
+        # Time window of the collected data, bounds included.
+        self._begin = float("-inf") if begin is None else begin
+        self._end = float("inf") if end is None else end
+
+    def get_title(self):
+        return self._title
+
+    def get_loggers(self):
+        return self._loggers
+
+    def get_window(self):
+        return (self._begin, self._end)
+
+    def needs_ordering(self):
+        return any(logger.NEEDS_ORDERING for logger in self._loggers)
+
+    def render(self):
+        for fmt in self._formats:
+            if fmt == "pdf":
+                self.plot()
+            else:
+                self.save_data(fmt)
 
     def plot(self):
+        import numpy as np
+
+        plt = _import_pyplot()
+
         figure = plt.figure()
         plt.title(self._title)
         plt.xlabel(self._x_label, figure=figure)
@@ -187,20 +448,71 @@ class Plot(object):
         for logger in self._loggers:
             x = logger.get_x_data()
             y = logger.get_y_data()
+            if self._max_points is not None and len(x) > self._max_points:
+                (x, y) = self._downsample(
+                    np.asarray(x), np.asarray(y), self._max_points
+                )
             line, = plt.plot(x, y, figure=figure)
             line.set_label(logger.get_name())
 
         figure.gca().legend()
         plt.savefig(Plot._format_filename(self._title))
+        plt.close(figure)
+
+    def save_data(self, fmt):
+        """
+            Saves the full (not downsampled) x/y series of each logger:
+
+              * `npz`: a single `TITLE.npz` archive with arrays `x0`, `y0`,
+                `x1`, `y1`, ... and `names`, the logger names,
+              * `npy`: a `TITLE` directory with `0-x.npy`, `0-y.npy`, ... and
+                `names.txt`, which can be loaded back with memory mapping
+                (`numpy.load(path, mmap_mode="r")`).
+        """
+        import numpy as np
+
+        names = [logger.get_name() for logger in self._loggers]
+
+        if fmt == "npz":
+            arrays = {}
+            for (i, logger) in enumerate(self._loggers):
+                arrays[f"x{i}"] = np.asarray(logger.get_x_data())
+                arrays[f"y{i}"] = np.asarray(logger.get_y_data())
+
+            np.savez(
+                Plot._format_filename(self._title, "npz"),
+                names=np.array(names),
+                **arrays,
+            )
+        elif fmt == "npy":
+            directory = Plot._format_filename(self._title, None)
+            os.makedirs(directory, exist_ok=True)
+
+            for (i, logger) in enumerate(self._loggers):
+                np.save(
+                    os.path.join(directory, f"{i}-x.npy"),
+                    np.asarray(logger.get_x_data()),
+                )
+                np.save(
+                    os.path.join(directory, f"{i}-y.npy"),
+                    np.asarray(logger.get_y_data()),
+                )
+
+            with open(os.path.join(directory, "names.txt"), "w") as f:
+                f.write("".join(f"{name}\n" for name in names))
+        else:
+            raise ValueError(f"unknown format `{fmt}`")
 
     @staticmethod
-    def _format_filename(title):
+    def _format_filename(title, extension="pdf"):
         title = title.lower()
         title = "".join("-" if not c.isalnum() else c for c in title)
         title = "".join(
             ["".join(j) if i != "-" else i for (i, j) in itertools.groupby(title)]
         )
-        return f"{title}.pdf"
+        if extension is None:
+            return title
+        return f"{title}.{extension}"
 
 
 @bt2.plugin_component_class
@@ -208,39 +520,266 @@ class PlotSink(bt2._UserSinkComponent):
     def __init__(self, config, params, obj):
         self._plots = []
 
+        defaults = PlotSink.get_options(params)
         for plot in params["plots"]:
-            self._plots.append(PlotSink.create_plot(plot))
+            self._plots.append(PlotSink.create_plot(plot, defaults))
+
+        # Number of processes rendering the plots at the end of the stream.
+        self._jobs = int(params["jobs"]) if "jobs" in params else 1
+
+        # Event class -> [(field, callback, begin, end)], filled on first
+        # sight of each event class so that events no logger cares about cost
+        # a single lookup. Event class IDs are only unique within a stream
+        # class, so the event class address is used as key.
+        self._dispatch = {}
+
+        # A new input port is added each time one gets connected, so any
+        # number of upstream ports can be plotted. Messages of different
+        # ports are only merged in timestamp order if a plot needs it.
+        self._ordered = any(plot.needs_ordering() for plot in self._plots)
 
         self._add_input_port("in")
 
+    def _user_port_connected(self, port, other_port):
+        self._add_input_port(f"in{len(self._input_ports)}")
+
+    def _user_graph_is_configured(self):
+        self._iters = [
+            self._create_message_iterator(port)
+            for port in self._input_ports.values()
+            if port.is_connected
+        ]
+
+        if not self._iters:
+            raise ValueError("PlotSink: no input port is connected")
+
+        # Next event message of each iterator, as (ts, msg), when ordered.
+        self._pending = [None] * len(self._iters)
+        self._next_iter = 0
+
+        if self._ordered and len(self._iters) > 1:
+            self._consume = self._consume_ordered
+        else:
+            self._consume = self._consume_round_robin
+
     def _user_consume(self):
-        msg = next(self._iter)
-        if type(msg) in [
-            bt2._PacketBeginningMessageConst,
-            bt2._PacketEndMessageConst,
-            bt2._StreamBeginningMessageConst,
-        ]:
+        self._consume()
+
+    def _consume_round_robin(self):
+        for _ in range(len(self._iters)):
+            index = self._next_iter
+            self._next_iter = (index + 1) % len(self._iters)
+
+            try:
+                msg = next(self._iters[index])
+            except bt2.TryAgain:
+                continue
+            except StopIteration:
+                self._remove_iterator(index)
+                return
+
+            if type(msg) is bt2._EventMessageConst:
+                self._handle_event(msg.default_clock_snapshot.value, msg.event)
             return
 
-        if type(msg) is bt2._StreamEndMessageConst:
-            {plot.plot() for plot in self._plots}
+        raise bt2.TryAgain
+
+    def _consume_ordered(self):
+        # The oldest event can only be handled once every iterator which
+        # hasn't ended has one pending.
+        try_again = False
+        index = 0
+        while index < len(self._iters):
+            if self._pending[index] is not None:
+                index += 1
+                continue
+
+            try:
+                msg = next(self._iters[index])
+            except bt2.TryAgain:
+                try_again = True
+                index += 1
+                continue
+            except StopIteration:
+                self._remove_iterator(index)
+                continue
+
+            if type(msg) is bt2._EventMessageConst:
+                self._pending[index] = (msg.default_clock_snapshot.value, msg)
+                index += 1
+
+        if try_again:
+            raise bt2.TryAgain
+
+        index = min(range(len(self._pending)), key=lambda i: self._pending[i][0])
+        (ts, msg) = self._pending[index]
+        self._pending[index] = None
+
+        self._handle_event(ts, msg.event)
+
+    def _remove_iterator(self, index):
+        del self._iters[index]
+        del self._pending[index]
+
+        if self._next_iter > index:
+            self._next_iter -= 1
+        if self._next_iter >= len(self._iters):
+            self._next_iter = 0
+
+        if not self._iters:
+            self._render_plots()
+            raise bt2.Stop
+
+    def _handle_event(self, ts, event):
+        event_class = event.cls
+        try:
+            handlers = self._dispatch[event_class.addr]
+        except KeyError:
+            handlers = self._create_handlers(event_class)
+            self._dispatch[event_class.addr] = handlers
+
+        if not handlers:
             return
 
-        ts = msg.default_clock_snapshot.value
+        payload = event.payload_field
+        for (field, callback, begin, end) in handlers:
+            if begin <= ts <= end:
+                callback(ts, payload[field])
+
+    def _create_handlers(self, event_class):
+        payload_class = event_class.payload_field_class
+        if payload_class is None:
+            return []
+
+        handlers = []
         for plot in self._plots:
-            plot.received_event(ts, msg.event)
+            (begin, end) = plot.get_window()
+            for logger in plot.get_loggers():
+                for (event, field, callback) in logger.get_subscriptions():
+                    if event == event_class.name and field in payload_class:
+                        handlers.append((field, callback, begin, end))
 
-    def _user_graph_is_configured(self):
-        self._iter = self._create_message_iterator(self._input_ports["in"])
+        return handlers
+
+    def _render_plots(self):
+        if self._jobs > 1 and len(self._plots) > 1:
+            errors = PlotSink._render_in_processes(self._plots, self._jobs)
+        else:
+            errors = [PlotSink._render(plot) for plot in self._plots]
+
+        errors = [error for error in errors if error is not None]
+        for (title, error) in errors:
+            print(f"PlotSink: failed to render plot `{title}`:", file=sys.stderr)
+            print(error, file=sys.stderr)
+
+        if errors:
+            titles = ", ".join(f"`{title}`" for (title, _) in errors)
+            raise RuntimeError(f"failed to render plots {titles}")
+
+    @staticmethod
+    def _render(plot):
+        try:
+            plot.render()
+        except Exception:
+            return (plot.get_title(), traceback.format_exc())
+
+        return None
 
     @staticmethod
-    def create_plot(params):
+    def _render_group(plots, writer):
+        for plot in plots:
+            writer.send(PlotSink._render(plot))
+        writer.close()
+
+    @staticmethod
+    def _render_in_processes(plots, jobs):
+        # Forked processes inherit the collected series, so nothing but the
+        # errors has to be pickled. Forking is also the only start method not
+        # relying on `sys.executable`, which is babeltrace2 itself when the
+        # plugin is loaded by the CLI.
+        context = multiprocessing.get_context("fork")
+
+        workers = []
+        for i in range(min(jobs, len(plots))):
+            group = plots[i::jobs]
+            (reader, writer) = context.Pipe(duplex=False)
+            process = context.Process(
+                target=PlotSink._render_group, args=(group, writer)
+            )
+            process.start()
+            writer.close()
+            workers.append((process, reader, group))
+
+        errors = []
+        for (process, reader, group) in workers:
+            for plot in group:
+                try:
+                    errors.append(reader.recv())
+                except EOFError:
+                    process.join()
+                    errors.append(
+                        (
+                            plot.get_title(),
+                            f"rendering process exited with code {process.exitcode}",
+                        )
+                    )
+            process.join()
+            reader.close()
+
+        return errors
+
+    @staticmethod
+    def get_options(params, defaults={}):
+        options = dict(defaults)
+
+        if "downsampling" in params:
+            options["downsampling"] = str(params["downsampling"])
+
+        if "max-points" in params:
+            options["max_points"] = int(params["max-points"])
+
+        if "spill-threshold" in params:
+            options["spill_threshold"] = int(params["spill-threshold"])
+
+        if "begin" in params:
+            options["begin"] = int(params["begin"])
+
+        if "end" in params:
+            options["end"] = int(params["end"])
+
+        if "min-interval" in params:
+            options["min_interval"] = int(params["min-interval"])
+
+        if "every" in params:
+            options["every"] = int(params["every"])
+
+        if "format" in params:
+            fmt = params["format"]
+            if type(fmt) is bt2._ArrayValueConst:
+                options["formats"] = tuple(str(f) for f in fmt)
+            else:
+                options["formats"] = (str(fmt),)
+
+        return options
+
+    @staticmethod
+    def create_plot(params, defaults={}):
+        options = dict(defaults)
+        if len(params) > 4:
+            options = PlotSink.get_options(params[4], defaults)
+
+        logger_options = {
+            key: options.pop(key)
+            for key in ("spill_threshold", "min_interval", "every")
+            if key in options
+        }
+
         loggers = []
         for logger in params[3]:
             if logger[0] == "timed":
-                logger = PlotSink.create_timed_logger(logger)
+                logger = PlotSink.create_timed_logger(logger, **logger_options)
             elif logger[0] == "interpolated":
-                logger = PlotSink.create_interpolated_logger(logger)
+                logger = PlotSink.create_interpolated_logger(logger, **logger_options)
             else:
                 raise ValueError
 
@@ -250,18 +789,23 @@ class PlotSink(bt2._UserSinkComponent):
         x_label = str(params[1])
         y_label = str(params[2])
 
-        return Plot(loggers, title=title, x_label=x_label, y_label=y_label)
+        return Plot(
+            loggers, title=title, x_label=x_label, y_label=y_label, **options
+        )
 
     @staticmethod
-    def create_timed_logger(params):
-        return TimedDataLogger((str(params[2]), str(params[3])), name=str(params[1]))
+    def create_timed_logger(params, **kwargs):
+        return TimedDataLogger(
+            (str(params[2]), str(params[3])), name=str(params[1]), **kwargs
+        )
 
     @staticmethod
-    def create_interpolated_logger(params):
+    def create_interpolated_logger(params, **kwargs):
         return InterpolatedDataLogger(
             (str(params[2]), str(params[3])),
             (str(params[4]), str(params[5])),
             name=str(params[1]),
+            **kwargs,
         )
 
 